@@ -0,0 +1,224 @@
+"""
+おみくじゲーム メモリ割り当ての計測 (Omikuji Allocation Tracking)
+
+1フレームの処理で確保したPythonのメモリ（tracemalloc）と、新しく作ったpygameのサーフェスの数、
+フレーム中に走ったガベージコレクションの回数と時間を計測する。
+毎フレーム新しいオブジェクトを作ると、ガベージコレクションが走ったフレームだけ遅くなる（カクつく）ので、
+状態ごとに1フレームあたりの上限（予算）を決めて、超えていないか確かめられるようにする。
+
+サーフェスは数え始めてから作られたものを数える:
+    pygame.Surface(...)、pygame.transform / pygame.image / pygame.surfarray の関数が返す新しいサーフェス、
+    数え始めてから作ったフォントの render、数え始めてから作ったサーフェスの copy / subsurface / convert / convert_alpha
+（数え始める前に作ったフォントやサーフェスのメソッドは数えられないので、install() の後でフォントを作り直す）
+置き換えた関数やクラスは少し遅くなるので、時間を計測している間は install() しない。
+
+使い方:
+    tracker = AllocationTracker()
+    ...  # 時間の計測
+    tracker.install()
+    ...  # フォントを作り直して、キャッシュを温め直す
+    tracker.start()
+    sample = tracker.measure(lambda: run_frame(pos, click))
+    tracker.stop()
+"""
+
+import gc
+import time
+import tracemalloc
+
+# pygame のモジュールの関数のうち、新しいサーフェスを返すもの
+SURFACE_FUNCTIONS = (
+    ("transform", ("flip", "scale", "scale_by", "smoothscale", "smoothscale_by", "rotate", "rotozoom",
+                   "chop", "grayscale", "laplacian")),
+    ("image", ("load", "frombuffer", "frombytes", "fromstring")),
+    ("surfarray", ("make_surface",)),
+)
+# サーフェスのメソッドのうち、新しいサーフェスを返すもの
+SURFACE_METHODS = ("copy", "subsurface", "convert", "convert_alpha")
+
+# 1フレームの計測結果
+class FrameAllocations:
+    __slots__ = ("peak_bytes", "retained_bytes", "surfaces", "gc_collections", "gc_ns")
+
+    def __init__(self, peak_bytes, retained_bytes, surfaces, gc_collections, gc_ns):
+        self.peak_bytes = peak_bytes  # フレーム中に一時的に確保したメモリの最大（開始時からの増分）
+        self.retained_bytes = retained_bytes  # フレームの後も残ったメモリ（負なら解放した）
+        self.surfaces = surfaces  # 作ったサーフェスの数
+        self.gc_collections = gc_collections  # 世代ごとのガベージコレクションの回数 (0, 1, 2)
+        self.gc_ns = gc_ns  # ガベージコレクションにかかった時間
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+# pygame のサーフェスを作る関数とクラスを、数を数えるものに置き換える
+class SurfaceCounter:
+    def __init__(self):
+        self.created = 0
+        self.originals = []  # 元に戻すための (モジュール, 名前, 元の値)
+
+    @property
+    def installed(self):
+        return bool(self.originals)
+
+    def _count(self, function):
+        counter = self
+
+        def counted(*args, **kwargs):
+            result = function(*args, **kwargs)
+            # 引数で渡したサーフェスに書き込んで返す場合（dest_surface など）は新しく作っていない
+            if not any(result is arg for arg in args) and not any(result is arg for arg in kwargs.values()):
+                counter.created += 1
+            return result
+
+        counted.__name__ = function.__name__
+        counted.__doc__ = function.__doc__
+        return counted
+
+    def _replace(self, module, name, value):
+        self.originals.append((module, name, getattr(module, name)))
+        setattr(module, name, value)
+
+    def install(self):
+        if self.installed:
+            return
+        import pygame
+        import pygame.font
+        import pygame.sysfont
+        import pygame.surfarray
+        counter = self
+
+        class CountingSurface(pygame.Surface):
+            def __init__(self, *args, **kwargs):
+                counter.created += 1
+                super().__init__(*args, **kwargs)
+
+        for name in SURFACE_METHODS:
+            setattr(CountingSurface, name, self._count(getattr(pygame.Surface, name)))
+
+        class CountingFont(pygame.font.Font):
+            render = self._count(pygame.font.Font.render)
+
+        self._replace(pygame, "Surface", CountingSurface)
+        # SysFont は pygame.sysfont に読み込んだ Font を使う
+        for module in (pygame.font, pygame.sysfont):
+            if getattr(module, "Font", None) is not None:
+                self._replace(module, "Font", CountingFont)
+        for module_name, names in SURFACE_FUNCTIONS:
+            module = getattr(pygame, module_name)
+            for name in names:
+                if hasattr(module, name):
+                    self._replace(module, name, self._count(getattr(module, name)))
+
+    def uninstall(self):
+        while self.originals:
+            module, name, value = self.originals.pop()
+            setattr(module, name, value)
+
+# フレームごとのメモリ割り当て・サーフェスの作成・ガベージコレクションを計測する
+class AllocationTracker:
+    def __init__(self, count_surfaces=True):
+        self.surfaces = SurfaceCounter() if count_surfaces else None
+        self.gc_collections = [0, 0, 0]
+        self.gc_ns = 0
+        self.gc_start = 0
+        self.running = False
+
+    def _on_gc(self, phase, info):
+        # ガベージコレクションの中で呼ばれるので、新しいオブジェクトはなるべく作らない
+        if phase == "start":
+            self.gc_start = time.perf_counter_ns()
+        else:
+            self.gc_collections[info["generation"]] += 1
+            self.gc_ns += time.perf_counter_ns() - self.gc_start
+
+    # サーフェスを数え始める（この後で作ったフォントの render も数えられる）
+    def install(self):
+        if self.surfaces is not None:
+            self.surfaces.install()
+
+    # 割り当ての計測を始める（tracemalloc は遅くなるので、時間の計測とは分けて使う）
+    def start(self):
+        if self.running:
+            return
+        self.install()
+        gc.callbacks.append(self._on_gc)
+        tracemalloc.start()
+        self.running = True
+
+    def stop(self):
+        if not self.running:
+            return
+        tracemalloc.stop()
+        gc.callbacks.remove(self._on_gc)
+        if self.surfaces is not None:
+            self.surfaces.uninstall()
+        self.running = False
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+    # run() を1回呼んで、その間の割り当てを FrameAllocations で返す
+    def measure(self, run):
+        collections = self.gc_collections
+        gc0, gc1, gc2 = collections
+        gc_ns = self.gc_ns
+        surfaces = self.surface_count()
+        tracemalloc.reset_peak()
+        base, _ = tracemalloc.get_traced_memory()
+        run()
+        current, peak = tracemalloc.get_traced_memory()
+        return FrameAllocations(peak - base, current - base, self.surface_count() - surfaces,
+                                (collections[0] - gc0, collections[1] - gc1, collections[2] - gc2),
+                                self.gc_ns - gc_ns)
+
+    def surface_count(self):
+        return self.surfaces.created if self.surfaces is not None else 0
+
+# 状態ごとの FrameAllocations のリストを集計する
+def summarize(samples):
+    if not samples:
+        return None
+    peaks = [s.peak_bytes for s in samples]
+    retained = [s.retained_bytes for s in samples]
+    surfaces = [s.surfaces for s in samples]
+    return {
+        "frames": len(samples),
+        "peak_kib": {"mean": round(sum(peaks) / len(peaks) / 1024, 4), "max": round(max(peaks) / 1024, 4)},
+        "retained_kib": {"mean": round(sum(retained) / len(retained) / 1024, 4),
+                         "max": round(max(retained) / 1024, 4)},
+        "surfaces": {"total": sum(surfaces), "max": max(surfaces),
+                     "frames": sum(1 for count in surfaces if count)},
+        "gc": {"collections": [sum(s.gc_collections[i] for s in samples) for i in range(3)],
+               "max_ms": round(max(s.gc_ns for s in samples) / 1e6, 4)},
+    }
+
+# 1フレームあたりの予算の項目（集計結果のどの値と比べるか）
+BUDGET_KEYS = {
+    "peak_kib": ("peak_kib", "max"),
+    "retained_kib": ("retained_kib", "max"),
+    "surfaces": ("surfaces", "max"),
+    "gc_ms": ("gc", "max_ms"),
+}
+
+# 集計結果を予算と比べて、超えた項目を (状態, 項目, 値, 予算) のリストで返す
+# budgets は {状態: {項目: 上限}}（"*" の状態は全ての状態に当てはめる）
+def check_budgets(summaries, budgets):
+    violations = []
+    for state, summary in summaries.items():
+        if summary is None:
+            continue
+        limits = dict(budgets.get("*", {}))
+        limits.update(budgets.get(state, {}))
+        for key, limit in limits.items():
+            if key not in BUDGET_KEYS:
+                raise ValueError(f"予算の項目が正しくありません: {key}（{', '.join(BUDGET_KEYS)} のどれか）")
+            group, field = BUDGET_KEYS[key]
+            value = summary[group][field]
+            if value > limit:
+                violations.append((state, key, value, limit))
+    return violations
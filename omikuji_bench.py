@@ -0,0 +1,306 @@
+"""
+おみくじゲーム ベンチマーク (Omikuji Game Benchmark)
+
+ディスプレイのない環境（SDL_VIDEODRIVER=dummy）でゲームループを動かし、
+状態ごとのフレーム時間とメモリ割り当て量をJSONで出力する。
+割り当ての計測では、1フレームに確保したメモリ・作ったサーフェスの数・ガベージコレクションも数え、
+--check-budgets を指定すると状態ごとの予算（ALLOC_BUDGETS か --budgets のJSON）を超えたときに失敗する。
+
+--replay を指定すると、ゲームで記録した入力（omikuji_game_jp.py --record）を
+待ち時間なしで再生して、同じ操作のフレーム時間を計測する。
+
+使い方:
+    python omikuji_bench.py --frames 300 --seed 1 > bench.json
+    python omikuji_bench.py --replay session.rec
+    python omikuji_bench.py --frames 120 --check-budgets
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import contextlib
+
+# ゲームを読み込む前にダミーのビデオドライバを設定する
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+# ゲームのログは標準エラーに出す（標準出力はJSON用）
+import omikuji_game_jp as omikuji
+from omikuji_recording import load_recording, seed_value
+from omikuji_profiler import percentiles
+from omikuji_allocations import AllocationTracker, summarize, check_budgets
+
+STATES = ("title", "drawing", "result", "multi_result")
+
+# 複数引きの結果画面で「次へ」を押す間隔（フレーム）
+NEXT_PAGE_INTERVAL = 60
+
+# ゲームの乱数を固定して、毎回同じ状態から始める
+def reset_game(seed):
+    omikuji.game.__init__()
+    omikuji.seed_game(seed)
+    omikuji.dirty.invalidate()
+    omikuji.static_layers.invalidate()
+    omikuji.timestep.reset()
+
+# 現在の状態と集めたサンプル数から、次のフレームでクリックするボタンを決める
+def scripted_click(counts, frames, state_frames):
+    game = omikuji.game
+
+    if game.state == "title":
+        if counts["title"] < frames:
+            return None
+        if counts["result"] < frames:
+            return omikuji.assets.draw_button
+        if counts["multi_result"] < frames:
+            return omikuji.assets.multi_button
+        return omikuji.assets.draw_button
+
+    if game.state == "result" and counts["result"] >= frames:
+        return omikuji.assets.back_button
+
+    if game.state == "multi_result":
+        if counts["multi_result"] >= frames:
+            return omikuji.assets.back_button
+        if game.current_index < game.draw_count - 1 and state_frames % NEXT_PAGE_INTERVAL == NEXT_PAGE_INTERVAL - 1:
+            return omikuji.assets.next_button
+
+    return None
+
+# 全ての状態で指定フレーム数を計測するまでゲームを進める
+def run_states(frames, seed, measure):
+    reset_game(seed)
+    samples = {state: [] for state in STATES}
+    counts = {state: 0 for state in STATES}
+
+    previous_state = None
+    state_frames = 0
+    # 状態遷移がうまくいかなかった場合の安全装置
+    max_frames = frames * len(STATES) * 20
+
+    for _ in range(max_frames):
+        if all(counts[state] >= frames for state in STATES):
+            break
+
+        state = omikuji.game.state
+        if state != previous_state:
+            state_frames = 0
+            previous_state = state
+
+        button = scripted_click(counts, frames, state_frames)
+        if button is not None:
+            mouse_pos, mouse_click = button.rect.center, True
+        else:
+            mouse_pos, mouse_click = (0, 0), False
+
+        value = measure(mouse_pos, mouse_click)
+        if counts[state] < frames:
+            samples[state].append(value)
+            counts[state] += 1
+        state_frames += 1
+
+    return samples
+
+def measure_time(mouse_pos, mouse_click):
+    start = time.perf_counter_ns()
+    omikuji.run_frame(mouse_pos, mouse_click)
+    return time.perf_counter_ns() - start
+
+# 割り当ての計測（時間の計測が終わってから install_tracker() で数え始める）
+tracker = AllocationTracker()
+
+# サーフェスを数え始めて、キャッシュを温め直す
+# フォントは数え始めてから作ったものでないと render を数えられないので、フォントやボタンを作り直す
+def install_tracker(warm):
+    tracker.install()
+    omikuji.assets.__dict__.clear()
+    omikuji.text_cache.clear()
+    warm()
+
+def measure_allocations(mouse_pos, mouse_click):
+    return tracker.measure(lambda: omikuji.run_frame(mouse_pos, mouse_click))
+
+# 状態ごとの1フレームあたりの割り当ての予算（"*" は全ての状態）
+# 毎フレーム新しいサーフェスを作ったり、ガベージコレクションが走るほど確保したりしていないかを見る
+ALLOC_BUDGETS = {
+    "*": {"peak_kib": 32, "surfaces": 2, "gc_ms": 5},
+}
+
+# 状態ごとの割り当ての集計を、レポートの項目にする
+def allocation_entry(samples):
+    return {
+        "alloc_peak_kib": percentiles([s.peak_bytes for s in samples], 1024),
+        "allocations": summarize(samples),
+    }
+
+def run_benchmark(frames=300, seed=0, warmup=30, allocations=True, quality="high"):
+    omikuji.init()
+
+    # 画質が途中で切り替わると比較できないので固定する
+    omikuji.quality.pin(quality)
+
+    # キャッシュを温めるための空回し（計測には含めない）
+    def warm():
+        if warmup > 0:
+            run_states(warmup, seed, lambda pos, click: omikuji.run_frame(pos, click))
+
+    warm()
+    times = run_states(frames, seed, measure_time)
+
+    allocs = None
+    if allocations:
+        install_tracker(warm)
+        with tracker:
+            allocs = run_states(frames, seed, measure_allocations)
+
+    report = {
+        "seed": seed,
+        "frames_per_state": frames,
+        "video_driver": os.environ.get("SDL_VIDEODRIVER"),
+        "dirty_rects": omikuji.dirty.enabled,
+        "quality": omikuji.quality.tier.name,
+        "python": sys.version.split()[0],
+        "states": {},
+    }
+    for state in STATES:
+        entry = {"frames": len(times[state]), "frame_time_ms": percentiles(times[state], 1e6)}
+        if allocs is not None:
+            entry.update(allocation_entry(allocs[state]))
+        report["states"][state] = entry
+    return report
+
+# 記録した入力を最初から再生して、フレームごとの measure の値を状態ごとに集める
+# 返り値: (状態ごとの値, 記録と状態がずれた最初のフレーム（ずれなければ None）)
+def replay_frames(header, frames, measure):
+    reset_game(header.seed)
+    tier_names = [tier.name for tier in omikuji.QUALITY_TIERS]
+    omikuji.quality.pin(tier_names[frames[0]["quality"]] if len(frames) else "high")
+    samples = {state: [] for state in omikuji.GAME_STATES}
+    diverged = None
+
+    for index, (frame_time, x, y, click, level, state) in enumerate(frames.tolist()):
+        state = omikuji.GAME_STATES[state]
+        if diverged is None and state != omikuji.game.state:
+            diverged = index
+        # 記録したときの画質で描画する（画質でパーティクルの乱数の使い方が変わる）
+        omikuji.quality.level = level
+        samples[omikuji.game.state].append(measure((x, y), bool(click), frame_time))
+
+    return samples, diverged
+
+def run_replay(path, warmup=30, allocations=True):
+    header, frames = load_recording(path)
+    omikuji.init()
+    omikuji.MULTI_DRAW_COUNT = header.multi
+
+    def warm():
+        # 記録したときの複数引きの枚数に合わせる
+        omikuji.assets.multi_button.text = f"{header.multi}連で引く"
+        if warmup > 0:
+            run_states(warmup, header.seed, lambda pos, click: omikuji.run_frame(pos, click))
+
+    warm()
+
+    def measure_time(mouse_pos, mouse_click, frame_time):
+        start = time.perf_counter_ns()
+        omikuji.run_frame(mouse_pos, mouse_click, frame_time)
+        return time.perf_counter_ns() - start
+
+    def measure_allocations(mouse_pos, mouse_click, frame_time):
+        return tracker.measure(lambda: omikuji.run_frame(mouse_pos, mouse_click, frame_time))
+
+    start = time.perf_counter()
+    times, diverged = replay_frames(header, frames, measure_time)
+    elapsed = time.perf_counter() - start
+
+    allocs = None
+    if allocations:
+        install_tracker(warm)
+        with tracker:
+            allocs, _ = replay_frames(header, frames, measure_allocations)
+
+    report = {
+        "replay": path,
+        "seed": header.seed,
+        "frames": len(frames),
+        "recorded_seconds": round(float(frames["frame_time"].sum()), 3),
+        "replay_seconds": round(elapsed, 3),
+        "diverged_at_frame": diverged,
+        "video_driver": os.environ.get("SDL_VIDEODRIVER"),
+        "dirty_rects": omikuji.dirty.enabled,
+        "python": sys.version.split()[0],
+        "states": {},
+    }
+    for state in omikuji.GAME_STATES:
+        if not times[state]:
+            continue
+        entry = {"frames": len(times[state]), "frame_time_ms": percentiles(times[state], 1e6)}
+        if allocs is not None:
+            entry.update(allocation_entry(allocs[state]))
+        report["states"][state] = entry
+    return report
+
+# 予算のJSONを読み込む（{"状態": {"項目": 上限}}、"*" は全ての状態）
+def load_budgets(path):
+    if path is None:
+        return ALLOC_BUDGETS
+    with open(path, encoding="utf-8") as f:
+        budgets = json.load(f)
+    if not isinstance(budgets, dict) or not all(isinstance(limits, dict) for limits in budgets.values()):
+        raise ValueError("予算は {\"状態\": {\"項目\": 上限}} の形で書いてください")
+    return budgets
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="おみくじゲームのフレーム時間ベンチマーク")
+    parser.add_argument("--frames", type=int, default=300, help="状態ごとに計測するフレーム数")
+    parser.add_argument("--seed", type=seed_value, default=0, help="乱数のシード")
+    parser.add_argument("--warmup", type=int, default=30, help="計測前に空回しするフレーム数（状態ごと）")
+    parser.add_argument("--no-alloc", action="store_true", help="メモリ割り当ての計測を省略する")
+    parser.add_argument("--quality", choices=[tier.name for tier in omikuji.QUALITY_TIERS], default="high",
+                        help="計測する画質")
+    parser.add_argument("--replay", help="再生する入力の記録（omikuji_game_jp.py --record で作ったファイル）")
+    parser.add_argument("--output", help="結果を書き出すJSONファイル（省略時は標準出力）")
+    parser.add_argument("--check-budgets", action="store_true",
+                        help="状態ごとの1フレームあたりの割り当てが予算を超えたら失敗する（終了コード1）")
+    parser.add_argument("--budgets", help="割り当ての予算のJSONファイル（省略時は ALLOC_BUDGETS）")
+    args = parser.parse_args(argv)
+    if args.check_budgets and args.no_alloc:
+        parser.error("--check-budgets と --no-alloc は同時に指定できません")
+    try:
+        budgets = load_budgets(args.budgets) if args.check_budgets else None
+    except (OSError, ValueError) as e:
+        sys.exit(f"予算のJSONを読み込めませんでした: {e}")
+
+    with contextlib.redirect_stdout(sys.stderr):
+        if args.replay:
+            try:
+                report = run_replay(args.replay, args.warmup, not args.no_alloc)
+            except (OSError, ValueError) as e:
+                sys.exit(f"入力の記録を読み込めませんでした: {e}")
+        else:
+            report = run_benchmark(args.frames, args.seed, args.warmup, not args.no_alloc, args.quality)
+    violations = []
+    if budgets is not None:
+        try:
+            violations = check_budgets({state: entry["allocations"] for state, entry in report["states"].items()},
+                                       budgets)
+        except ValueError as e:
+            sys.exit(str(e))
+        report["budget_violations"] = [{"state": state, "budget": key, "value": value, "limit": limit}
+                                       for state, key, value, limit in violations]
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    for state, key, value, limit in violations:
+        print(f"予算超過: {state} の {key} が {value}（予算 {limit}）", file=sys.stderr)
+    if violations:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+おみくじ一括抽選 (Omikuji Bulk Draw)
+
+監査やイベントの計画のために、おみくじを大量に（数百万〜数十億回）引いて
+運勢ごとの回数と合計ポイントを集計する。pygameは使わない。
+
+抽選はNumPyでまとめて行い、各回の結果は保存せずに回数だけを数える。
+--workers を指定すると、チャンクごとに独立したシードの乱数列を使って
+複数のプロセスで並列に抽選する（結果はワーカー数に関係なく同じになる）。
+
+使い方:
+    python omikuji_bulk.py -n 100000000 --workers 4 --seed 1
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from omikuji_fortunes import fortune_table, load_table
+
+# 1チャンク（1タスク）あたりの抽選回数と、1回のNumPy呼び出しで引く回数
+DEFAULT_CHUNK_SIZE = 1 << 24
+BATCH_SIZE = 1 << 20
+
+# 集計結果（運勢ごとの回数と合計ポイント）
+class DrawTally:
+    def __init__(self, table=fortune_table):
+        self.table = table
+        self.counts = np.zeros(len(table), dtype=np.int64)
+        self.points = table.points
+
+    @property
+    def draws(self):
+        return int(self.counts.sum())
+
+    @property
+    def total_points(self):
+        return int(self.counts @ self.points)
+
+    def add(self, counts):
+        self.counts += counts
+
+    def to_dict(self):
+        draws = self.draws
+        return {
+            "draws": draws,
+            "total_points": self.total_points,
+            "mean_points": self.total_points / draws if draws else None,
+            "fortunes": [
+                {"result": entry["result"], "count": int(count),
+                 "ratio": int(count) / draws if draws else None}
+                for entry, count in zip(self.table, self.counts)
+            ],
+        }
+
+# 1チャンク分を抽選して、運勢ごとの回数を返す（ワーカープロセスで実行される）
+def draw_chunk(count, seed_sequence, table):
+    rng = np.random.default_rng(seed_sequence)
+    size = len(table)
+    counts = np.zeros(size, dtype=np.int64)
+    remaining = count
+    while remaining > 0:
+        batch = min(BATCH_SIZE, remaining)
+        counts += np.bincount(table.sample_indices(rng, batch), minlength=size)
+        remaining -= batch
+    return counts
+
+# n回を抽選のチャンクに分ける（各チャンクに独立した乱数列を割り当てる）
+def plan_chunks(n, seed, chunk_size):
+    sizes = [chunk_size] * (n // chunk_size)
+    if n % chunk_size:
+        sizes.append(n % chunk_size)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    return list(zip(sizes, seeds))
+
+# 抽選しながら、途中までの集計結果を順に返す
+def iter_bulk_draws(n, seed=None, workers=1, chunk_size=DEFAULT_CHUNK_SIZE, table=fortune_table):
+    tally = DrawTally(table)
+    chunks = plan_chunks(n, seed, chunk_size)
+
+    if workers <= 1:
+        for count, seed_sequence in chunks:
+            tally.add(draw_chunk(count, seed_sequence, table))
+            yield tally
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(draw_chunk, count, seed_sequence, table)
+                   for count, seed_sequence in chunks]
+        for future in as_completed(futures):
+            tally.add(future.result())
+            yield tally
+
+# n回抽選して最終的な集計結果を返す
+def bulk_draw(n, seed=None, workers=1, chunk_size=DEFAULT_CHUNK_SIZE, table=fortune_table):
+    tally = DrawTally(table)
+    for tally in iter_bulk_draws(n, seed, workers, chunk_size, table):
+        pass
+    return tally
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="おみくじを大量に引いて集計する")
+    parser.add_argument("-n", "--draws", type=int, default=10_000_000, help="抽選回数")
+    parser.add_argument("--seed", type=int, default=None, help="乱数のシード（省略時は毎回異なる）")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="並列に抽選するプロセス数（0でCPUコア数）")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE,
+                        help="1タスクあたりの抽選回数")
+    parser.add_argument("--fortunes", help="運勢表のJSONファイル（省略時は標準の運勢表）")
+    parser.add_argument("--progress", action="store_true", help="途中経過を標準エラーに表示する")
+    parser.add_argument("--json", action="store_true", help="結果をJSONで出力する")
+    args = parser.parse_args(argv)
+    if args.draws < 1:
+        parser.error("--draws には1以上を指定してください")
+    if args.chunk_size < 1:
+        parser.error("--chunk-size には1以上を指定してください")
+    if args.workers < 0:
+        parser.error("--workers には0以上を指定してください")
+
+    workers = args.workers or os.cpu_count() or 1
+    table = load_table(args.fortunes) if args.fortunes else fortune_table
+    start = time.perf_counter()
+    tally = DrawTally(table)
+    for tally in iter_bulk_draws(args.draws, args.seed, workers, args.chunk_size, table):
+        if args.progress:
+            print(f"{tally.draws:,} / {args.draws:,} 回", file=sys.stderr)
+    elapsed = time.perf_counter() - start
+
+    report = tally.to_dict()
+    report["seconds"] = round(elapsed, 3)
+    report["draws_per_second"] = round(tally.draws / elapsed) if elapsed > 0 else None
+    report["workers"] = workers
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        return
+
+    # 1回も引いていなければ割合と平均は None になる
+    for fortune in report["fortunes"]:
+        ratio = "-" if fortune["ratio"] is None else f"{fortune['ratio']:.3%}"
+        print(f"{fortune['result']:<4} {fortune['count']:>15,} ({ratio:>7})")
+    mean = "-" if report["mean_points"] is None else f"{report['mean_points']:+.4f}"
+    print(f"合計ポイント: {report['total_points']:+,} (平均 {mean} pt)")
+    print(f"{report['draws']:,} 回 / {elapsed:.2f} 秒 ({report['draws_per_second']:,} 回/秒, {workers} プロセス)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""
+おみくじゲーム フォント検索 (Omikuji Game Font Resolver)
+
+Linux / macOS / Windows の標準的なフォントディレクトリを一度だけ走査して、
+ゲームで使う仮名・漢字をすべて表示できるフォントを探す。
+結果はディレクトリの更新時刻と一緒にインデックスファイルへ保存し、
+次回以降の起動ではフォントファイルを開かずに同じフォントを使う。
+"""
+
+import os
+import sys
+import json
+import hashlib
+
+import pygame
+
+# pygame.freetype が無いビルドでは文字の確認を省略する
+try:
+    import pygame.freetype as freetype
+except ImportError:
+    freetype = None
+
+INDEX_VERSION = 1
+INDEX_FILENAME = "font_index.json"
+FONT_EXTENSIONS = (".ttf", ".ttc", ".otf", ".otc")
+
+# 優先して使うフォント（見つかればこの順番で確認する）
+PREFERRED_FONTS = [
+    # macOS
+    "/System/Library/Fonts/ヒラギノ角ゴシック W4.ttc",
+    "/System/Library/Fonts/ヒラギノ丸ゴ ProN W4.ttc",
+    "/System/Library/Fonts/AppleGothic.ttf",
+    "/System/Library/Fonts/Hiragino Sans GB.ttc",
+    "/Library/Fonts/Osaka.ttf",
+    # Linux
+    "/usr/share/fonts/opentype/noto/NotoSansCJK-Regular.ttc",
+    "/usr/share/fonts/noto-cjk/NotoSansCJK-Regular.ttc",
+    "/usr/share/fonts/google-noto-cjk/NotoSansCJK-Regular.ttc",
+    "/usr/share/fonts/truetype/takao-gothic/TakaoPGothic.ttf",
+    "/usr/share/fonts/opentype/ipafont-gothic/ipagp.ttf",
+    # Windows
+    "C:\\Windows\\Fonts\\YuGothM.ttc",
+    "C:\\Windows\\Fonts\\meiryo.ttc",
+    "C:\\Windows\\Fonts\\msgothic.ttc",
+]
+
+# ファイル名にこれらが含まれるフォントは日本語に対応している可能性が高いので先に確認する
+CJK_NAME_HINTS = ("cjk", "jp", "japan", "hiragino", "gothic", "mincho", "meiryo", "yugoth",
+                  "ipa", "takao", "vl-", "osaka", "sawarabi", "mplus", "m+", "source han",
+                  "sourcehan", "ヒラギノ", "ゴシック", "明朝")
+
+# OSごとのフォントディレクトリ
+def font_directories():
+    home = os.path.expanduser("~")
+    if sys.platform == "darwin":
+        dirs = ["/System/Library/Fonts", "/Library/Fonts",
+                os.path.join(home, "Library", "Fonts")]
+    elif sys.platform.startswith("win"):
+        windir = os.environ.get("WINDIR", "C:\\Windows")
+        dirs = [os.path.join(windir, "Fonts")]
+        local = os.environ.get("LOCALAPPDATA")
+        if local:
+            dirs.append(os.path.join(local, "Microsoft", "Windows", "Fonts"))
+    else:
+        data_home = os.environ.get("XDG_DATA_HOME", os.path.join(home, ".local", "share"))
+        dirs = ["/usr/share/fonts", "/usr/local/share/fonts",
+                os.path.join(data_home, "fonts"), os.path.join(home, ".fonts")]
+    return [d for d in dirs if os.path.isdir(d)]
+
+# フォントディレクトリを走査して、フォントファイルと各ディレクトリの更新時刻を集める
+def scan_font_files(directories):
+    files = []
+    mtimes = {}
+    for top in directories:
+        for root, _, names in os.walk(top):
+            try:
+                mtimes[root] = os.stat(root).st_mtime
+            except OSError:
+                continue
+            for name in names:
+                if name.lower().endswith(FONT_EXTENSIONS):
+                    files.append(os.path.join(root, name))
+    return files, mtimes
+
+# フォントが指定した文字をすべて持っているか確認する
+# （pygame.font は無いグリフにも代替の寸法を返すので、pygame.freetype で調べる）
+def font_covers(path, chars):
+    if freetype is None:
+        return True
+    if not freetype.get_init():
+        freetype.init()
+    try:
+        font = freetype.Font(path, 16)
+        metrics = font.get_metrics(chars)
+    except (OSError, pygame.error):
+        return False
+    return all(m is not None for m in metrics)
+
+# 確認する順番（優先フォント → 名前から日本語らしいもの → その他）
+def candidate_order(files):
+    def priority(path):
+        if path in PREFERRED_FONTS:
+            return (0, PREFERRED_FONTS.index(path))
+        name = os.path.basename(path).lower()
+        if any(hint in name for hint in CJK_NAME_HINTS):
+            return (1, 0)
+        return (2, 0)
+    return sorted(files, key=priority)
+
+def chars_key(chars):
+    return hashlib.sha1("".join(sorted(set(chars))).encode("utf-8")).hexdigest()
+
+def load_index(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def save_index(path, index):
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(index, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"フォントインデックスを保存できませんでした: {e}")
+
+# インデックスがまだ有効か（文字・ディレクトリの更新時刻・フォントファイルが変わっていないか）
+def index_is_valid(index, chars):
+    if not index or index.get("version") != INDEX_VERSION:
+        return False
+    if index.get("chars") != chars_key(chars):
+        return False
+    if sorted(index.get("roots", [])) != sorted(font_directories()):
+        return False
+    for directory, mtime in index.get("dirs", {}).items():
+        try:
+            if os.stat(directory).st_mtime != mtime:
+                return False
+        except OSError:
+            return False
+    font = index.get("font")
+    return font is None or os.path.exists(font)
+
+# 日本語を表示できるフォントのパスを返す（見つからなければNone）
+def resolve_font_path(chars, cache_dir):
+    index_path = os.path.join(cache_dir, INDEX_FILENAME)
+    index = load_index(index_path)
+    if index_is_valid(index, chars):
+        return index["font"]
+
+    roots = font_directories()
+    files, mtimes = scan_font_files(roots)
+    # フォントディレクトリの外にある優先フォントも確認する
+    files.extend(p for p in PREFERRED_FONTS if p not in files and os.path.exists(p))
+
+    font = None
+    for path in candidate_order(files):
+        if font_covers(path, chars):
+            font = path
+            break
+
+    save_index(index_path, {
+        "version": INDEX_VERSION,
+        "chars": chars_key(chars),
+        "roots": roots,
+        "dirs": mtimes,
+        "font": font,
+    })
+    return font
@@ -0,0 +1,174 @@
+"""
+おみくじの運勢表と得点のルール (Omikuji Fortune Table)
+
+運勢表（結果・色・説明・ポイント・重み）はJSONファイルから読み込む。
+重み付きの抽選はWalkerのエイリアス法で1回あたりO(1)で行い、
+エイリアス表はJSONファイルの隣にキャッシュして次回からはすぐに読み込む。
+
+pygameに依存しないので、ゲーム以外（一括抽選など）からも同じ表を使える。
+"""
+
+import os
+import json
+import random
+import hashlib
+
+import numpy as np
+
+# 標準の運勢表（環境変数 OMIKUJI_FORTUNES で別のファイルを指定できる）
+DEFAULT_TABLE_PATH = os.environ.get(
+    "OMIKUJI_FORTUNES", os.path.join(os.path.dirname(os.path.abspath(__file__)), "fortunes.json"))
+
+CACHE_VERSION = 1
+CACHE_SUFFIX = ".alias.npz"
+
+# Walkerのエイリアス表を作る（Voseの方法）
+# 返り値の prob[i] は i をそのまま選ぶ確率、alias[i] はそれ以外のときに選ぶ番号
+def build_alias_table(weights):
+    weights = np.asarray(weights, dtype=np.float64)
+    n = len(weights)
+    scaled = weights * n / weights.sum()
+    prob = np.ones(n, dtype=np.float64)
+    alias = np.arange(n, dtype=np.int64)
+
+    small = [i for i in range(n) if scaled[i] < 1.0]
+    large = [i for i in range(n) if scaled[i] >= 1.0]
+    while small and large:
+        s = small.pop()
+        l = large.pop()
+        prob[s] = scaled[s]
+        alias[s] = l
+        scaled[l] = scaled[l] + scaled[s] - 1.0
+        if scaled[l] < 1.0:
+            small.append(l)
+        else:
+            large.append(l)
+    # 残りは丸め誤差を除いて確率1
+    for i in small + large:
+        prob[i] = 1.0
+    return prob, alias
+
+# 運勢表の各項目を確認して、ゲームで使う形に整える
+def normalize_entry(entry, index):
+    try:
+        normalized = {
+            "result": str(entry["result"]),
+            "color": tuple(int(c) for c in entry["color"]),
+            "description": str(entry["description"]),
+            "points": int(entry["points"]),
+            "weight": float(entry.get("weight", 1)),
+        }
+    except (KeyError, TypeError, ValueError) as e:
+        raise ValueError(f"運勢表の{index + 1}番目の項目が正しくありません: {e}") from None
+    if len(normalized["color"]) != 3:
+        raise ValueError(f"運勢表の{index + 1}番目の色はRGBの3つの値で指定してください")
+    if not normalized["weight"] >= 0:
+        raise ValueError(f"運勢表の{index + 1}番目の重みが負の値です")
+    return normalized
+
+# 運勢表（重み付き抽選つき）
+class FortuneTable:
+    def __init__(self, entries, prob=None, alias=None):
+        self.entries = [normalize_entry(entry, i) for i, entry in enumerate(entries)]
+        if not self.entries:
+            raise ValueError("運勢表が空です")
+        weights = np.array([entry["weight"] for entry in self.entries], dtype=np.float64)
+        if weights.sum() <= 0:
+            raise ValueError("運勢表の重みの合計が0です")
+
+        if prob is None or alias is None:
+            prob, alias = build_alias_table(weights)
+        self.prob = prob
+        self.alias = alias
+        self.probabilities = weights / weights.sum()
+        self.points = np.array([entry["points"] for entry in self.entries], dtype=np.int64)
+        # 全て同じ重みならエイリアス表を使わずに一様に選ぶ
+        self.uniform = bool(np.all(weights == weights[0]))
+        # 1回ずつ引くとき用（NumPyの要素を取り出すよりリストの方が速い）
+        self._prob_list = prob.tolist()
+        self._alias_list = alias.tolist()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def __getitem__(self, index):
+        return self.entries[index]
+
+    # 1回引いて運勢の番号を返す（rng は random モジュール互換のもの）
+    def draw_index(self, rng=random):
+        i = rng.randrange(len(self.entries))
+        if self.uniform or rng.random() < self._prob_list[i]:
+            return i
+        return self._alias_list[i]
+
+    # 1回引いて運勢を返す
+    def draw(self, rng=random):
+        return self.entries[self.draw_index(rng)]
+
+    # まとめて引いて運勢の番号の配列を返す（rng は numpy.random.Generator）
+    def sample_indices(self, rng, size):
+        n = len(self.entries)
+        dtype = np.uint8 if n <= 256 else np.int64
+        indices = rng.integers(0, n, size, dtype=dtype)
+        if self.uniform:
+            return indices
+        keep = rng.random(size) < self.prob[indices]
+        return np.where(keep, indices, self.alias[indices].astype(dtype))
+
+# ファイルの内容からキャッシュの照合用の値を作る
+def source_key(data):
+    return hashlib.sha1(data).hexdigest()
+
+# キャッシュしたエイリアス表を読み込む（運勢表が変わっていたら None）
+# キャッシュは運勢表から作り直せるので、空や途中までのファイルなど読めないものは全て None にする
+def load_compiled(cache_path, key, size):
+    try:
+        with np.load(cache_path, allow_pickle=False) as cache:
+            if int(cache["version"]) != CACHE_VERSION or str(cache["key"]) != key:
+                return None
+            prob, alias = cache["prob"], cache["alias"]
+    except Exception:
+        return None
+    if prob.shape != (size,) or alias.shape != (size,) or (size and (alias.min() < 0 or alias.max() >= size)):
+        return None
+    return prob, alias
+
+def save_compiled(cache_path, key, prob, alias):
+    try:
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp.npz"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, version=CACHE_VERSION, key=key, prob=prob, alias=alias)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        print(f"運勢表のキャッシュを保存できませんでした: {e}")
+
+# 運勢表をファイルから読み込む（エイリアス表はファイルの隣にキャッシュする）
+def load_table(path=DEFAULT_TABLE_PATH):
+    with open(path, "rb") as f:
+        data = f.read()
+    document = json.loads(data.decode("utf-8"))
+    entries = document["fortunes"] if isinstance(document, dict) else document
+
+    key = source_key(data)
+    cache_path = path + CACHE_SUFFIX
+    compiled = load_compiled(cache_path, key, len(entries))
+    if compiled is not None:
+        return FortuneTable(entries, *compiled)
+
+    table = FortuneTable(entries)
+    save_compiled(cache_path, key, table.prob, table.alias)
+    return table
+
+fortune_table = load_table()
+
+# おみくじの結果（ゲームの表示用に、運勢表の項目をそのまま公開する）
+omikuji_results = fortune_table.entries
+
+# 複数回引いたときの合計ポイント
+def total_points(results):
+    return sum(result["points"] for result in results)
@@ -7,18 +7,29 @@ Licensed under MIT License
 """
 
 import pygame
+import numpy as np
 import sys
 import random
 import math
 import os
+import time
+import hashlib
+import heapq
+import argparse
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import cached_property
 
-# 初期化
-pygame.init()
+from omikuji_fonts import resolve_font_path
+from omikuji_fortunes import fortune_table, omikuji_results, total_points
+from omikuji_history import DrawHistory, DEFAULT_HISTORY_PATH
+from omikuji_odds import score_odds
+from omikuji_recording import InputRecorder, seed_value
+from omikuji_profiler import FrameProfiler
 
-# 画面設定
+# 画面設定（ゲームは常にこの論理解像度で描画する）
 WIDTH, HEIGHT = 800, 600
-screen = pygame.display.set_mode((WIDTH, HEIGHT))
-pygame.display.set_caption("おみくじゲーム")
+screen = None  # init_display() で作成する（論理解像度の描画先）
 
 # 色の定義
 WHITE = (255, 255, 255)
@@ -34,111 +45,712 @@ LIGHT_BROWN = (205, 133, 63)  # 明るい茶色
 CREAM = (255, 253, 208)    # クリーム色
 PAPER = (252, 246, 225)    # 和紙色
 
-# 背景画像の作成
-def create_background_texture():
-    # 和紙風の背景テクスチャを作成
-    texture = pygame.Surface((WIDTH, HEIGHT))
-    texture.fill(PAPER)
-    
-    # ランダムな模様を追加
-    for _ in range(5000):
-        x = random.randint(0, WIDTH-1)
-        y = random.randint(0, HEIGHT-1)
-        color_var = random.randint(-10, 10)
-        color = (245 + color_var, 240 + color_var, 220 + color_var)
-        size = random.randint(1, 3)
-        pygame.draw.circle(texture, color, (x, y), size)
-    
-    return texture
-
-# 背景テクスチャを作成
-background_texture = create_background_texture()
-
-# macOSの日本語フォントパスを探す
-font_paths = [
-    "/System/Library/Fonts/ヒラギノ角ゴシック W4.ttc",
-    "/System/Library/Fonts/ヒラギノ丸ゴ ProN W4.ttc",
-    "/System/Library/Fonts/AppleGothic.ttf",
-    "/System/Library/Fonts/Hiragino Sans GB.ttc",
-    "/Library/Fonts/Osaka.ttf"
-]
+# 起動時間の内訳（フェーズごとのミリ秒）
+class StartupTimer:
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.phases = []
+        
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, (time.perf_counter() - start) * 1000))
+            
+    def report(self):
+        lines = ["起動時間の内訳:"]
+        for name, ms in self.phases:
+            lines.append(f"  {name:<16} {ms:8.1f} ms")
+        lines.append(f"  {'合計':<14} {(time.perf_counter() - self.origin) * 1000:8.1f} ms")
+        return "\n".join(lines)
+
+startup = StartupTimer()
+
+# キャッシュファイルの保存先（環境変数で変更可能）
+CACHE_DIR = os.environ.get("OMIKUJI_CACHE_DIR",
+                           os.path.join(os.path.expanduser("~"), ".cache", "omikuji"))
 
-# 利用可能なフォントを探す
-font_path = None
-for path in font_paths:
-    if os.path.exists(path):
-        font_path = path
-        break
+# 背景テクスチャの設定
+BACKGROUND_SEED = 1
+BACKGROUND_SPECKLES = 5000
+# (地の色, 模様の基本色, 模様の色のばらつき)
+BACKGROUND_PALETTE = (PAPER, (245, 240, 220), 10)
+
+# 和紙風の背景テクスチャのピクセルを生成（NumPyで一括処理）
+def generate_background_pixels(width, height, seed, palette=BACKGROUND_PALETTE, speckles=BACKGROUND_SPECKLES):
+    base_color, speckle_color, color_range = palette
+    rng = np.random.default_rng(seed)
+    
+    pixels = np.empty((width, height, 3), dtype=np.uint8)
+    pixels[:, :] = base_color
+    
+    # ランダムな模様（半径1〜3の小さな円）の位置・色・大きさ
+    xs = rng.integers(0, width, speckles)
+    ys = rng.integers(0, height, speckles)
+    color_var = rng.integers(-color_range, color_range + 1, speckles)
+    sizes = rng.integers(1, 4, speckles)
+    colors = np.clip(np.array(speckle_color)[None, :] + color_var[:, None], 0, 255).astype(np.uint8)
+    
+    # 最大半径の円の範囲のオフセットを用意し、各模様の半径でマスクする
+    dx, dy = np.meshgrid(np.arange(-3, 4), np.arange(-3, 4), indexing="ij")
+    dx, dy = dx.ravel(), dy.ravel()
+    px = xs[:, None] + dx[None, :]
+    py = ys[:, None] + dy[None, :]
+    mask = (dx * dx + dy * dy)[None, :] <= sizes[:, None] ** 2
+    mask &= (px >= 0) & (px < width) & (py >= 0) & (py < height)
+    
+    index = np.nonzero(mask)
+    pixels[px[index], py[index]] = colors[index[0]]
+    return pixels
 
-# フォント設定
-if font_path:
+# 背景画像の作成（生成結果はディスクにキャッシュする）
+def create_background_texture(width=WIDTH, height=HEIGHT, seed=BACKGROUND_SEED,
+                              palette=BACKGROUND_PALETTE, cache_dir=CACHE_DIR):
+    key = repr((seed, width, height, palette, BACKGROUND_SPECKLES)).encode("utf-8")
+    cache_path = os.path.join(cache_dir, f"background_{hashlib.sha1(key).hexdigest()[:16]}.png")
+    
+    if os.path.exists(cache_path):
+        try:
+            return pygame.image.load(cache_path).convert()
+        except pygame.error:
+            print("背景テクスチャのキャッシュを読み込めませんでした。作り直します。")
+    
+    pixels = generate_background_pixels(width, height, seed, palette)
+    texture = pygame.surfarray.make_surface(pixels)
+    
+    # 一時ファイルに書いてから置き換える（途中で終了しても壊れたキャッシュを残さない）
     try:
-        font_large = pygame.font.Font(font_path, 48)
-        font_medium = pygame.font.Font(font_path, 36)
-        font_small = pygame.font.Font(font_path, 24)
-        print(f"日本語フォントを読み込みました: {font_path}")
-    except:
-        print("日本語フォントの読み込みに失敗しました。デフォルトフォントを使用します。")
-        font_large = pygame.font.SysFont(None, 72)
-        font_medium = pygame.font.SysFont(None, 48)
-        font_small = pygame.font.SysFont(None, 36)
-else:
-    print("日本語フォントが見つかりませんでした。デフォルトフォントを使用します。")
-    font_large = pygame.font.SysFont(None, 72)
-    font_medium = pygame.font.SysFont(None, 48)
-    font_small = pygame.font.SysFont(None, 36)
-
-# おみくじの結果
-omikuji_results = [
-    {"result": "大吉", "color": RED, "description": "とても良い運勢です！", "points": 10},
-    {"result": "中吉", "color": GREEN, "description": "良い運勢です。", "points": 5},
-    {"result": "小吉", "color": BLUE, "description": "まあまあの運勢です。", "points": 3},
-    {"result": "吉", "color": GOLD, "description": "普通の運勢です。", "points": 1},
-    {"result": "末吉", "color": ORANGE, "description": "少し注意が必要かもしれません。", "points": 0},
-    {"result": "凶", "color": PURPLE, "description": "今日は慎重に行動しましょう。", "points": -1},
-    {"result": "大凶", "color": BROWN, "description": "とても注意が必要な日です。", "points": -5}
-]
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp.png"
+        pygame.image.save(texture, tmp_path)
+        os.replace(tmp_path, cache_path)
+    except (OSError, pygame.error) as e:
+        print(f"背景テクスチャのキャッシュを保存できませんでした: {e}")
+    
+    return texture.convert()
+
+# 画面に表示する文字列（フォントが対応しているかの確認に使う）
+UI_TEXTS = ["おみくじゲーム", "～運命の神様～", "おみくじを引く", "3連で引く", "タイトルに戻る",
+            "次へ", "前へ", "おみくじを引いています...", "クリックでスキップ", "1/3回目", "合計",
+            "記録を見る", "おみくじの記録", "回", "平均", "連続", "最長", "今回", "まだ記録がありません",
+            "この合計以上になる確率", "その他"]
+
+# フォントが持っている必要のある仮名・漢字
+def required_chars():
+    texts = list(UI_TEXTS)
+    for result in omikuji_results:
+        texts.append(result["result"])
+        texts.append(result["description"])
+    return "".join(sorted({c for c in "".join(texts) if ord(c) >= 0x3000}))
+
+# フォント設定（大・中・小のフォントを返す）
+def load_fonts():
+    # 利用可能なフォントを探す（結果はインデックスに保存され、次回からは走査しない）
+    font_path = resolve_font_path(required_chars(), CACHE_DIR)
+    
+    if font_path:
+        try:
+            fonts = (pygame.font.Font(font_path, 48),
+                     pygame.font.Font(font_path, 36),
+                     pygame.font.Font(font_path, 24))
+            print(f"日本語フォントを読み込みました: {font_path}")
+            return fonts
+        except:
+            print("日本語フォントの読み込みに失敗しました。デフォルトフォントを使用します。")
+    else:
+        print("日本語フォントが見つかりませんでした。デフォルトフォントを使用します。")
+    
+    return (pygame.font.SysFont(None, 72),
+            pygame.font.SysFont(None, 48),
+            pygame.font.SysFont(None, 36))
+
+# テキスト描画キャッシュ（LRU方式）
+# 日本語グリフのラスタライズは重いので、同じ文字列の描画結果を使い回す
+class TextCache:
+    def __init__(self, max_size=256):
+        self.max_size = max_size
+        self.surfaces = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        
+    def render(self, font, text, antialias, color):
+        # キャッシュされたサーフェスは共有されるので、set_alphaを使う場合は毎回設定すること
+        key = (font, text, antialias, tuple(color))
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.hits += 1
+            self.surfaces.move_to_end(key)
+            return surface
+        
+        self.misses += 1
+        surface = font.render(text, antialias, color)
+        self.surfaces[key] = surface
+        # 上限を超えたら最も古く使われたものから捨てる
+        while len(self.surfaces) > self.max_size:
+            self.surfaces.popitem(last=False)
+        return surface
+        
+    def clear(self):
+        self.surfaces.clear()
+
+text_cache = TextCache()
+
+# 光の効果用スプライトアトラス
+# タイトル画面の光線の粒や穴の光の輪を半径とアルファを量子化して一度だけ描画し、使い回す
+class GlowAtlas:
+    def __init__(self, radius_step=0.5, alpha_step=5):
+        self.radius_step = radius_step
+        self.alpha_step = alpha_step
+        self.sprites = {}
+        self.created = 0  # 作成したスプライトの数
+        self.hits = 0
+        
+    def _quantize(self, value, step):
+        return round(value / step) * step
+        
+    def _alpha(self, alpha):
+        return max(0, min(255, int(self._quantize(alpha, self.alpha_step))))
+        
+    def _get(self, key, build):
+        sprite = self.sprites.get(key)
+        if sprite is None:
+            sprite = build()
+            self.sprites[key] = sprite
+            self.created += 1
+        else:
+            self.hits += 1
+        return sprite
+        
+    def dot(self, radius, color, alpha):
+        # 半透明の円（光線の粒）
+        radius = self._quantize(radius, self.radius_step)
+        alpha = self._alpha(alpha)
+        
+        def build():
+            s = pygame.Surface((radius*2, radius*2), pygame.SRCALPHA)
+            pygame.draw.circle(s, (*color, alpha), (radius, radius), radius)
+            return s
+        
+        return self._get(("dot", radius, tuple(color), alpha), build)
+        
+    def ellipse(self, width, height, color, alpha):
+        # 半透明の楕円（穴の周りの光の輪）
+        width, height = int(width), int(height)
+        alpha = self._alpha(alpha)
+        
+        def build():
+            s = pygame.Surface((width, height), pygame.SRCALPHA)
+            pygame.draw.ellipse(s, (*color, alpha), (0, 0, width, height))
+            return s
+        
+        return self._get(("ellipse", width, height, tuple(color), alpha), build)
+
+glow_atlas = GlowAtlas()
+
+# 円のスプライト（色と整数の半径ごとに一度だけ描いて、画面と同じ形式に変換して使い回す）
+# 外側と内側の2重の円も1枚のスプライトにして、1回の転送で描けるようにする
+# pygame.draw.circle は中心と半径を整数に切り捨てるので、同じ整数で引けば同じ絵になる
+class CircleSprites:
+    COLORKEYS = ((255, 0, 255), (0, 255, 0), (0, 0, 255))
+    
+    def __init__(self):
+        self.sprites = {}
+        self.created = 0
+        self.hits = 0
+        
+    # rings: ((色, 半径), ...) を外側から順に。返り値は (画像, 中心からの左上の位置)、何も描かれなければ None
+    def get(self, rings):
+        sprite = self.sprites.get(rings)
+        if sprite is not None or rings in self.sprites:
+            self.hits += 1
+            return sprite
+        sprite = self.create(rings)
+        self.sprites[rings] = sprite
+        self.created += 1
+        return sprite
+        
+    def create(self, rings):
+        outer = max(radius for _, radius in rings)
+        if outer < 1:
+            return None
+        colors = {tuple(color) for color, _ in rings}
+        colorkey = next(key for key in self.COLORKEYS if key not in colors)
+        center = outer + 1
+        canvas = pygame.Surface((center * 2, center * 2))
+        canvas.fill(colorkey)
+        rect = None
+        for color, radius in rings:
+            drawn = pygame.draw.circle(canvas, color, (center, center), radius)
+            rect = drawn if rect is None else rect.union(drawn)
+        image = canvas.subsurface(rect).convert()
+        image.set_colorkey(colorkey, pygame.RLEACCEL)
+        return image, (rect.x - center, rect.y - center)
+
+circle_sprites = CircleSprites()
+
+# 1フレームの中で描くスプライトを溜めて、Surface.blits() の1回の呼び出しでまとめて転送する
+# 描画順を保つため、重なり順が変わるところ（パーティクル・装飾・光線など）ごとに flush() する
+class SpriteBatch:
+    def __init__(self):
+        self.items = []
+        self.calls = 0  # このフレームで blits() を呼んだ回数
+        self.sprites = 0  # このフレームで転送したスプライトの数
+        self.frame_calls = 0  # 直前のフレームの値（表示用）
+        self.frame_sprites = 0
+        self.total_calls = 0
+        self.total_sprites = 0
+        self.frames = 0
+        
+    def add(self, image, position):
+        self.items.append((image, position))
+        
+    # 円を中心の位置に描く（中心は pygame.draw.circle と同じく整数に切り捨てる）
+    def circle(self, rings, center):
+        sprite = circle_sprites.get(rings)
+        if sprite is not None:
+            image, (dx, dy) = sprite
+            self.items.append((image, (int(center[0]) + dx, int(center[1]) + dy)))
+            
+    # 溜めたスプライトを転送して、描画した範囲のリストを返す（ダーティ矩形モード以外では空）
+    def flush(self, surface):
+        if not self.items:
+            return []
+        rects = surface.blits(self.items, dirty.enabled)
+        self.calls += 1
+        self.sprites += len(self.items)
+        self.items.clear()
+        return rects or []
+        
+    def end_frame(self):
+        self.frame_calls, self.frame_sprites = self.calls, self.sprites
+        self.total_calls += self.calls
+        self.total_sprites += self.sprites
+        self.frames += 1
+        self.calls = 0
+        self.sprites = 0
+
+sprite_batch = SpriteBatch()
+
+# 回転・拡大縮小の結果キャッシュ（LRU方式）
+# 角度と倍率を一定の刻みに丸めて、同じ変形を毎フレーム計算しないようにする
+class TransformCache:
+    def __init__(self, angle_step=0.5, scale_step=0.05, max_size=128):
+        self.angle_step = angle_step
+        self.scale_step = scale_step
+        self.max_size = max_size
+        self.surfaces = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        
+    def _quantize(self, value, step):
+        return round(value / step) * step
+        
+    def _get(self, key, build):
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.hits += 1
+            self.surfaces.move_to_end(key)
+            return surface
+        
+        self.misses += 1
+        surface = build()
+        self.surfaces[key] = surface
+        while len(self.surfaces) > self.max_size:
+            self.surfaces.popitem(last=False)
+        return surface
+        
+    def rotate(self, surface, angle):
+        angle = self._quantize(angle % 360, self.angle_step)
+        return self._get((surface, angle, 1.0),
+                         lambda: pygame.transform.rotate(surface, angle))
+        
+    def rotozoom(self, surface, angle, scale):
+        angle = self._quantize(angle % 360, self.angle_step)
+        scale = self._quantize(scale, self.scale_step)
+        return self._get((surface, angle, scale),
+                         lambda: pygame.transform.rotozoom(surface, angle, scale))
+        
+    def clear(self):
+        self.surfaces.clear()
+
+transform_cache = TransformCache()
+
+# おみくじ紙の元画像（サイズごとに一度だけ作る）
+paper_surfaces = {}
+
+def get_paper_surface(width, height, color=(255, 250, 240)):
+    key = (width, height, color)
+    surface = paper_surfaces.get(key)
+    if surface is None:
+        surface = pygame.Surface((width, height), pygame.SRCALPHA)
+        pygame.draw.rect(surface, color, (0, 0, width, height), border_radius=10)
+        pygame.draw.rect(surface, BLACK, (0, 0, width, height), 2, border_radius=10)
+        paper_surfaces[key] = surface
+    return surface
+
+# 周期的に動く値を一定の時間間隔ごとに前計算した表（pygame.time.get_ticks() のミリ秒で引く）
+class CurveTable:
+    def __init__(self, period, resolution, build, dtype=np.float32):
+        # 1周期をちょうど割り切れる間隔にして、周期の境目で値が飛ばないようにする
+        steps = max(1, round(period / resolution))
+        self.resolution = period / steps
+        self.values = np.asarray(build(np.arange(steps)[:, None] * self.resolution), dtype=dtype)
+        
+    def at(self, ticks):
+        return self.values[int(ticks / self.resolution) % len(self.values)].tolist()
+
+# 装飾の sin の周期（ミリ秒）
+CURVE_PERIOD = 2 * math.pi / 0.001  # current_time * 0.001 と * 0.002 の動き
+RAY_PERIOD = 2 * math.pi / 0.0005  # 光線の回転
+CURVE_RESOLUTION = 4  # 表の時間間隔（ミリ秒、1フレームより十分短い）
+RAY_RESOLUTION = 8
+
+# 時間で動く装飾の位置と大きさ（最初に使うときに表を作り、毎フレームは表から1行引くだけ）
+class DecorationCurves:
+    @cached_property
+    def petals(self):
+        # 桜の花びら 8個の (y, 大きさ, 内側の大きさ)
+        def build(t):
+            index = np.arange(8)
+            size = 20 + np.sin(t * 0.002 + index * 0.5) * 5
+            y = HEIGHT - 100 + np.sin(t * 0.001 + index) * 20
+            return np.stack((y.astype(int), size.astype(int), (size * 0.7).astype(int)), axis=-1)
+        return CurveTable(CURVE_PERIOD, CURVE_RESOLUTION, build, np.int32)
+        
+    @cached_property
+    def top_decorations(self):
+        # 上部の装飾 6個の (y, 大きさ, 内側の大きさ)
+        def build(t):
+            index = np.arange(6)
+            size = 15 + np.sin(t * 0.002 + index * 0.5) * 3
+            y = 50 + np.sin(t * 0.001 + index) * 10
+            return np.stack((y.astype(int), size.astype(int), (size * 0.7).astype(int)), axis=-1)
+        return CurveTable(CURVE_PERIOD, CURVE_RESOLUTION, build, np.int32)
+        
+    @cached_property
+    def wave(self):
+        # 和風の装飾ラインの点 (x, y)
+        def build(t):
+            x = np.arange(0, WIDTH, 20)
+            y = HEIGHT - 30 + np.sin(x * 0.05 + t * 0.001) * 5
+            return np.stack((np.broadcast_to(x, y.shape), y), axis=-1)
+        return CurveTable(CURVE_PERIOD, CURVE_RESOLUTION, build)
+        
+    @cached_property
+    def title_dots(self):
+        # タイトル画面の背景の点の大きさ（TITLE_DOT_POSITIONS の順）
+        phase = np.array([(i + j) * 0.1 for i, j in TITLE_DOT_POSITIONS])
+        return CurveTable(CURVE_PERIOD, CURVE_RESOLUTION, lambda t: 3 + np.sin(t * 0.001 + phase) * 2)
+        
+    @cached_property
+    def box_patterns(self):
+        # タイトル画面の箱の模様 12個の (大きさ, 内側の大きさ)（BOX_PATTERN_POSITIONS の順）
+        phase = np.array([i * j for i, j in BOX_PATTERN_CELLS])
+        def build(t):
+            size = 8 + np.sin(t * 0.001 + phase) * 2
+            return np.stack((size, size * 0.6), axis=-1)
+        return CurveTable(CURVE_PERIOD, CURVE_RESOLUTION, build)
+        
+    @cached_property
+    def rays(self):
+        # 8本の光線の10個の点の、光の中心からの位置（点の大きさの分だけ左上にずらしたもの）
+        def build(t):
+            index = np.arange(RAY_COUNT)
+            angle = index * (2 * math.pi / RAY_COUNT) + t * 0.0005
+            length = 50 + np.sin(t * 0.001 + index) * 20
+            x = (np.cos(angle) * length)[:, :, None] * RAY_PROGRESS - RAY_DOT_SIZES
+            y = (np.sin(angle) * length)[:, :, None] * RAY_PROGRESS - RAY_DOT_SIZES
+            return np.stack((x, y), axis=-1)
+        return CurveTable(RAY_PERIOD, RAY_RESOLUTION, build)
+
+curves = DecorationCurves()
+
+# タイトル画面のタイトルの装飾枠
+TITLE_FRAME_RECT = pygame.Rect(50, HEIGHT//4 - 30, 350, 120)
+
+# タイトル画面の背景の点（16 x 12 の格子のうち i + j が100の倍数の位置）
+# 装飾枠は静的レイヤーに描いてあるので、枠に重なる点は除く
+TITLE_DOT_POSITIONS = [(i, j) for i in range(0, WIDTH, 50) for j in range(0, HEIGHT, 50)
+                       if (i + j) % 100 == 0 and not TITLE_FRAME_RECT.inflate(10, 10).collidepoint(i, j)]
+
+# タイトル画面の箱の模様（4列 x 3行）
+BOX_PATTERN_CELLS = [(i, j) for i in range(4) for j in range(3)]
+
+# タイトル画面の光線（8本 x 10個の点）
+RAY_COUNT = 8
+RAY_PROGRESS = np.arange(10) / 10
+RAY_DOT_SIZES = 5 * (1 - RAY_PROGRESS)
+RAY_DOT_ALPHAS = (200 * (1 - RAY_PROGRESS)).astype(int)
+
+# ダーティ矩形モード（--dirty-rects または環境変数 OMIKUJI_DIRTY_RECTS=1 で有効）
+# 前フレームと今フレームで描画した範囲だけを背景で消して画面に転送する
+DIRTY_RECTS = os.environ.get("OMIKUJI_DIRTY_RECTS") == "1"
+
+class DirtyRects:
+    def __init__(self, enabled):
+        self.enabled = enabled
+        self.current = []  # 今フレームで描画した矩形
+        self.previous = []  # 前フレームで描画した矩形
+        self.full_redraw = True
+        
+    def set_enabled(self, enabled):
+        # 切り替えたら次のフレームは画面全体を描き直す
+        self.enabled = enabled
+        self.current = []
+        self.previous = []
+        self.full_redraw = True
+        
+    def add(self, rects):
+        # 描画関数が返した矩形（またはそのリスト）を記録する
+        if not self.enabled or rects is None:
+            return
+        if isinstance(rects, pygame.Rect):
+            self.current.append(rects)
+        else:
+            self.current.extend(rects)
+            
+    def invalidate(self):
+        # 次のフレームを画面全体で描き直す
+        self.full_redraw = True
+        
+    def begin_frame(self, surface, background):
+        if not self.enabled or self.full_redraw:
+            surface.blit(background, (0, 0))
+            if self.enabled:
+                self.current.append(surface.get_rect())
+            self.full_redraw = False
+            return
+        
+        # 前フレームで描画した部分だけを背景で消す
+        for rect in self.previous:
+            surface.blit(background, rect, rect)
+            
+    def present(self):
+        if not self.enabled:
+            window.present()
+            return
+        
+        window.present(self.previous + self.current)
+        self.previous = self.current
+        self.current = []
+
+dirty = DirtyRects(DIRTY_RECTS)
+
+# ウィンドウ（ゲームは常に論理解像度で描画し、大きな画面ではSDLに拡大させる）
+# scaled: pygame.SCALED でSDLに拡大させる（4Kなどの大きな画面でもソフトウェアで描く量は変わらない）
+# 描画は800x600の座標で行うので、表示する画面を縮小しても描く量は減らず、縮小の分だけ遅くなる
+# （縮小して転送する倍率は計測で全ての状態で遅くなったので設けない）
+class Window:
+    def __init__(self):
+        self.scaled = os.environ.get("OMIKUJI_SCALED") == "1"
+        self.fullscreen = os.environ.get("OMIKUJI_FULLSCREEN") == "1"
+        self.surface = None
+        
+    def open(self):
+        flags = 0
+        if self.scaled or self.fullscreen:
+            flags |= pygame.SCALED
+            flags |= pygame.FULLSCREEN if self.fullscreen else pygame.RESIZABLE
+        self.surface = pygame.display.set_mode((WIDTH, HEIGHT), flags)
+        return self.surface
+        
+    # SCALED でも更新する範囲は論理解像度の座標で渡せる（マウスの座標もSDLが論理解像度に戻す）
+    def present(self, rects=None):
+        if rects is None:
+            pygame.display.flip()
+        else:
+            pygame.display.update(rects)
+
+window = Window()
+
+# 区間ごとの処理時間の計測（F3キーまたは環境変数 OMIKUJI_PROFILE=1 で有効になる）
+profiler = FrameProfiler(enabled=os.environ.get("OMIKUJI_PROFILE") == "1")
+
+# 計測結果を画面の左上に表示する（文字の描画は数フレームに1回だけ）
+class ProfilerHud:
+    def __init__(self, refresh_frames=15):
+        self.refresh_frames = refresh_frames
+        self.surface = None
+        self.built_at = -refresh_frames
+        
+    def build(self):
+        sections, frame_avg, frame_max = profiler.stats()
+        rows = [(f"ms  [{quality.tier.name}]", "avg", "max"), ("frame", f"{frame_avg:.2f}", f"{frame_max:.2f}")]
+        for name, avg, worst in sorted(sections, key=lambda section: -section[1]):
+            rows.append((name, f"{avg:.2f}", f"{worst:.2f}"))
+        # まとめて転送した回数とスプライトの数（直前のフレーム）
+        rows.append(("blits / sprites", f"{sprite_batch.frame_calls}", f"{sprite_batch.frame_sprites}"))
+        
+        # 列ごとに描画して右揃えにする（標準フォントは等幅ではないので）
+        font = assets.hud_font
+        rendered = [[font.render(cell, True, WHITE) for cell in row] for row in rows]
+        widths = [max(row[i].get_width() for row in rendered) + 12 for i in range(3)]
+        line_height = font.get_linesize()
+        surface = pygame.Surface((sum(widths) + 12, line_height * len(rows) + 8), pygame.SRCALPHA)
+        surface.fill((0, 0, 0, 170))
+        for i, row in enumerate(rendered):
+            y = 4 + i * line_height
+            surface.blit(row[0], (6, y))
+            surface.blit(row[1], (6 + widths[0] + widths[1] - row[1].get_width(), y))
+            surface.blit(row[2], (6 + sum(widths) - row[2].get_width(), y))
+        return surface
+        
+    def draw(self, surface):
+        if self.surface is None or profiler.frame - self.built_at >= self.refresh_frames:
+            self.surface = self.build()
+            self.built_at = profiler.frame
+        return surface.blit(self.surface, (8, 8))
+
+profiler_hud = ProfilerHud()
+
+# パーティクルシステム（NumPyの配列でまとめて管理）
+class ParticleSystem:
+    def __init__(self, capacity=2048, gravity=0.1, size_decay=0.05):
+        self.capacity = capacity
+        self.gravity = gravity
+        self.size_decay = size_decay
+        self.count = 0  # 生きているパーティクルの数（先頭からcount個が有効）
+        self.x = np.zeros(capacity, dtype=np.float32)
+        self.y = np.zeros(capacity, dtype=np.float32)
+        self.prev_x = np.zeros(capacity, dtype=np.float32)  # 補間描画用の1ステップ前の位置
+        self.prev_y = np.zeros(capacity, dtype=np.float32)
+        self.vx = np.zeros(capacity, dtype=np.float32)
+        self.vy = np.zeros(capacity, dtype=np.float32)
+        self.life = np.zeros(capacity, dtype=np.int32)  # ステップ単位の寿命
+        self.size = np.zeros(capacity, dtype=np.float32)
+        self.color_index = np.zeros(capacity, dtype=np.uint8)
+        self.colors = []  # 色のパレット（color_indexで参照）
+        self._color_lookup = {}
+        self.rng = np.random.default_rng()
+        
+    def seed(self, seed):
+        self.rng = np.random.default_rng(seed)
+        
+    def _color_to_index(self, color):
+        color = tuple(color)
+        index = self._color_lookup.get(color)
+        if index is None:
+            index = len(self.colors)
+            if index > 255:
+                raise ValueError("パーティクルの色は256色までです")
+            self.colors.append(color)
+            self._color_lookup[color] = index
+        return index
+        
+    def emit(self, x, y, color, count=1):
+        # 容量を超える分は捨てる
+        count = min(count, self.capacity - self.count)
+        if count <= 0:
+            return 0
+        
+        start, end = self.count, self.count + count
+        self.x[start:end] = x
+        self.y[start:end] = y
+        self.prev_x[start:end] = x
+        self.prev_y[start:end] = y
+        self.vx[start:end] = self.rng.uniform(-3, 3, count)
+        self.vy[start:end] = self.rng.uniform(-5, -1, count)
+        self.life[start:end] = self.rng.integers(30, 91, count)
+        self.size[start:end] = self.rng.integers(3, 9, count)
+        self.color_index[start:end] = self._color_to_index(color)
+        self.count = end
+        return count
+        
+    def update(self):
+        n = self.count
+        if n == 0:
+            return
+        
+        self.prev_x[:n] = self.x[:n]
+        self.prev_y[:n] = self.y[:n]
+        self.x[:n] += self.vx[:n]
+        self.y[:n] += self.vy[:n]
+        self.vy[:n] += self.gravity  # 重力
+        self.life[:n] -= 1
+        np.maximum(self.size[:n] - self.size_decay, 0, out=self.size[:n])
+        
+        # 寿命が尽きたものを末尾の生存パーティクルと入れ替えて詰める
+        dead = np.flatnonzero(self.life[:n] <= 0)
+        if len(dead) == 0:
+            return
+        new_count = n - len(dead)
+        holes = dead[dead < new_count]
+        tail = new_count + np.flatnonzero(self.life[new_count:n] > 0)
+        for array in (self.x, self.y, self.prev_x, self.prev_y, self.vx, self.vy,
+                      self.life, self.size, self.color_index):
+            array[holes] = array[tail]
+        self.count = new_count
+        
+    def draw(self, surface, alpha=1.0):
+        # alpha: 前のステップから現在のステップまでの補間率（0〜1）
+        n = self.count
+        sizes = self.size[:n].astype(np.int32)
+        alive = np.flatnonzero(sizes > 0)
+        if len(alive) == 0:
+            return []
+        xs = (self.prev_x[alive] + (self.x[alive] - self.prev_x[alive]) * alpha).astype(np.int32)
+        ys = (self.prev_y[alive] + (self.y[alive] - self.prev_y[alive]) * alpha).astype(np.int32)
+        
+        # 色と大きさの組ごとに円のスプライトを引いて、位置はまとめて計算する
+        keys = self.color_index[alive].astype(np.int64) << 32 | sizes[alive]
+        unique, inverse = np.unique(keys, return_inverse=True)
+        sprites = [circle_sprites.get(((self.colors[key >> 32], key & 0xFFFFFFFF),)) for key in unique.tolist()]
+        images = [image for image, _ in sprites]
+        offsets = np.array([offset for _, offset in sprites], dtype=np.int32)
+        positions = zip((xs + offsets[inverse, 0]).tolist(), (ys + offsets[inverse, 1]).tolist())
+        sprite_batch.items.extend(zip(map(images.__getitem__, inverse.tolist()), positions))
+        
+        # 全てのパーティクルを1回の blits() で描く
+        return sprite_batch.flush(surface)
+                
+    def clear(self):
+        self.count = 0
+        
+    def __len__(self):
+        return self.count
+
+# ゲームの状態の名前（入力の記録には番号で保存する）
+GAME_STATES = ("title", "drawing", "result", "multi_result", "stats")
 
 # ゲーム状態
 class GameState:
     def __init__(self):
-        self.state = "title"  # title, drawing, result, triple_result
-        self.result = None
-        self.triple_results = []  # 3連用の結果を格納
-        self.current_triple_index = 0  # 3連表示中のインデックス
-        self.total_points = 0  # 3連引きの合計ポイント
+        self.state = "title"  # GAME_STATES のどれか
+        self.draw_count = 1  # 1回に引く枚数
+        self.results = []  # 引いた結果（引き始めにまとめて決める）
+        self.cards = []  # 結果画面に表示するカード（結果ごと）
+        self.current_index = 0  # 複数引きの結果画面で表示中のインデックス
+        self.total_points = 0  # 複数引きの合計ポイント
+        self.total_odds = 1.0  # 同じ枚数を引いて合計ポイントがこれ以上になる確率
         self.animation_timer = 0
         self.shake_amount = 0
-        self.paper_y = -300  # 紙の初期位置（画面外）
-        self.paper_speed = 0
-        self.paper_rotation = 0
-        self.paper_scale = 0.1
         self.result_alpha = 0  # 結果テキストの透明度
-        self.particles = []  # パーティクル効果用
+        self.particles = ParticleSystem()  # パーティクル効果用
+        self.previous = {}  # 補間描画用の1ステップ前の値
+        
+    # 補間して描画する値（おみくじ紙の動きは時刻から計算するので含めない）
+    INTERPOLATED = ("shake_amount",)
+    
+    def save_previous(self):
+        for name in self.INTERPOLATED:
+            self.previous[name] = getattr(self, name)
+            
+    def interpolate(self, name, alpha):
+        current = getattr(self, name)
+        previous = self.previous.get(name, current)
+        return previous + (current - previous) * alpha
         
 game = GameState()
 
-# パーティクルクラス
-class Particle:
-    def __init__(self, x, y, color):
-        self.x = x
-        self.y = y
-        self.color = color
-        self.size = random.randint(3, 8)
-        self.speed_x = random.uniform(-3, 3)
-        self.speed_y = random.uniform(-5, -1)
-        self.life = random.randint(30, 90)  # フレーム単位の寿命
-        
-    def update(self):
-        self.x += self.speed_x
-        self.y += self.speed_y
-        self.speed_y += 0.1  # 重力
-        self.life -= 1
-        self.size = max(0, self.size - 0.05)
-        
-    def draw(self, surface):
-        if self.life > 0 and self.size > 0:
-            pygame.draw.circle(surface, self.color, (int(self.x), int(self.y)), int(self.size))
+# ゲームの乱数を固定する（同じシードと入力なら同じ結果になる）
+def seed_game(seed):
+    random.seed(seed)
+    game.particles.seed(seed)
+
+# 抽選履歴（main() で履歴ファイルを開くまでは、この起動中の分だけを集計する）
+history = DrawHistory()
 
 # ボタンクラス
 class Button:
@@ -152,11 +764,12 @@ class Button:
         self.target_scale = 1.0
         self.angle = 0  # 装飾用の角度
         
-    def draw(self, surface):
+    def update(self):
         # アニメーション効果（ホバー時に少し大きくなる）
         self.scale += (self.target_scale - self.scale) * 0.2
         self.angle = (self.angle + 1) % 360  # 装飾アニメーション用
         
+    def draw(self, surface):
         # スケールに基づいて拡大されたボタンの矩形を計算
         scaled_width = self.rect.width * self.scale
         scaled_height = self.rect.height * self.scale
@@ -197,10 +810,13 @@ class Button:
                                int(scaled_rect.bottom - corner_size - offset)), 3)
         
         # テキスト
-        text_surface = font_medium.render(self.text, True, (60, 30, 10))
+        text_surface = text_cache.render(assets.font_medium, self.text, True, (60, 30, 10))
         text_rect = text_surface.get_rect(center=scaled_rect.center)
         surface.blit(text_surface, text_rect)
         
+        # 描画した範囲を返す（ダーティ矩形モード用）
+        return scaled_rect.unionall([shadow_rect, text_rect])
+        
     def check_hover(self, pos):
         was_hovered = self.is_hovered
         self.is_hovered = self.rect.collidepoint(pos)
@@ -216,36 +832,189 @@ class Button:
     def is_clicked(self, pos, click):
         return self.rect.collidepoint(pos) and click
 
-# ボタン作成
-draw_button = Button(WIDTH//2 - 160, HEIGHT - 100, 300, 60, "おみくじを引く", (255, 230, 200), (255, 200, 150))
-triple_button = Button(WIDTH//2 + 160, HEIGHT - 100, 300, 60, "3連で引く", (230, 255, 200), (200, 255, 150))
-back_button = Button(WIDTH//2, HEIGHT - 100, 300, 60, "タイトルに戻る", (255, 230, 200), (255, 200, 150))
-next_button = Button(WIDTH//2 + 160, HEIGHT - 100, 150, 60, "次へ ▶", (230, 230, 255), (200, 200, 255))
+# フォント・テクスチャ・ボタンは最初に使われたときに作成する
+class Assets:
+    @cached_property
+    def fonts(self):
+        with startup.phase("fonts"):
+            return load_fonts()
+        
+    @cached_property
+    def font_large(self):
+        return self.fonts[0]
+        
+    @cached_property
+    def font_medium(self):
+        return self.fonts[1]
+        
+    @cached_property
+    def font_small(self):
+        return self.fonts[2]
+        
+    @cached_property
+    def hud_font(self):
+        # 計測結果の表示用（英数字だけなので標準フォント）
+        return pygame.font.Font(None, 20)
+        
+    @cached_property
+    def background_texture(self):
+        with startup.phase("background"):
+            return create_background_texture()
+        
+    @cached_property
+    def buttons(self):
+        # ボタン作成
+        with startup.phase("buttons"):
+            return {
+                "draw": Button(WIDTH//2 - 160, HEIGHT - 100, 300, 60, "おみくじを引く", (255, 230, 200), (255, 200, 150)),
+                "multi": Button(WIDTH//2 + 160, HEIGHT - 100, 300, 60, f"{MULTI_DRAW_COUNT}連で引く", (230, 255, 200), (200, 255, 150)),
+                "back": Button(WIDTH//2, HEIGHT - 100, 300, 60, "タイトルに戻る", (255, 230, 200), (255, 200, 150)),
+                "next": Button(WIDTH//2 + 160, HEIGHT - 100, 150, 60, "次へ ▶", (230, 230, 255), (200, 200, 255)),
+                "prev": Button(WIDTH//2 - 160, HEIGHT - 100, 150, 60, "◀ 前へ", (230, 230, 255), (200, 200, 255)),
+                "stats": Button(WIDTH//2, HEIGHT - 32, 200, 50, "記録を見る", (240, 230, 210), (230, 210, 180)),
+            }
+        
+    @cached_property
+    def draw_button(self):
+        return self.buttons["draw"]
+        
+    @cached_property
+    def multi_button(self):
+        return self.buttons["multi"]
+        
+    @cached_property
+    def back_button(self):
+        return self.buttons["back"]
+        
+    @cached_property
+    def next_button(self):
+        return self.buttons["next"]
+        
+    @cached_property
+    def prev_button(self):
+        return self.buttons["prev"]
+        
+    @cached_property
+    def stats_button(self):
+        return self.buttons["stats"]
+
+assets = Assets()
+
+# pygameの初期化
+def init_pygame():
+    if not pygame.get_init():
+        with startup.phase("pygame.init"):
+            pygame.init()
+
+# ウィンドウの作成
+def init_display():
+    global screen
+    if screen is None:
+        with startup.phase("display"):
+            screen = window.open()
+            pygame.display.set_caption("おみくじゲーム")
+    return screen
+
+# ゲームを動かす前に必要な初期化（何度呼んでもよい）
+def init():
+    init_pygame()
+    return init_display()
+
+# 複数引きの枚数（--multi で変更できる）
+MULTI_DRAW_COUNT = 3
+
+# おみくじ紙のアニメーション（ステップ単位）
+PAPER_LAUNCH = 90  # 1枚目が箱から出てくるまで（約1.5秒）
+PAPER_STAGGER = 15  # 複数引きで次の紙が出てくるまでの間隔（前の紙の落下と重ねる）
+PAPER_REST_Y = HEIGHT//2 - 50  # 紙が止まる位置
+
+# 紙が止まるまでのステップ数（y = -300 + 0.25 * t * (t + 1) が PAPER_REST_Y に届くまで）
+PAPER_FALL_STEPS = math.ceil((math.sqrt(1 + 16 * (PAPER_REST_Y + 300)) - 1) / 2)
 
-# おみくじを引く関数
-def draw_omikuji(triple=False):
+# i枚目の紙が出てくる時刻
+def paper_launch(i):
+    return PAPER_LAUNCH + i * PAPER_STAGGER
+
+# n枚の紙がすべて止まるまでのステップ数
+def drawing_steps(n):
+    return paper_launch(n - 1) + PAPER_FALL_STEPS + 1
+
+# timer の時点で出てくる時刻を過ぎた紙の枚数
+def papers_before(timer, n):
+    return min(n, max(0, (timer - PAPER_LAUNCH - 1) // PAPER_STAGGER + 1))
+
+# 出てきてから t ステップ後の紙の位置・回転・拡大率（t は小数でもよい）
+# 毎ステップ速度を0.5ずつ上げて落とすのと同じ動きを式で求めるので、何枚あっても状態を持たない
+def paper_pose(t):
+    t = min(max(t, 0), PAPER_FALL_STEPS)
+    return -300 + 0.25 * t * (t + 1), 5 * t, min(1.0, 0.1 + 0.05 * t)
+
+# 結果画面のカード（運勢ごとに一度だけ作り、複数引きでも同じものを使う）
+class ResultCard:
+    def __init__(self, result):
+        self.result = result
+        self.color = result["color"]
+        self.points = result["points"]
+        self.result_text = text_cache.render(assets.font_large, result["result"], True, BLACK)
+        self.desc_text = text_cache.render(assets.font_small, result["description"], True, BLACK)
+        self.points_text = text_cache.render(assets.font_medium, f"{self.points:+d} pt", True,
+                                             (50, 180, 50) if self.points >= 0 else (180, 50, 50))
+        # 結果のポイントに応じて基本サイズを変更（大吉ほど大きく）
+        self.base_size = 10 + min(5, abs(self.points)) * 1.2
+        # アニメーションをおみくじの結果と連動させる（ポイントが高いほど速く動く）
+        self.anim_speed = 0.01 + abs(self.points) * 0.002
+
+result_cards = {}
+
+def get_result_card(result):
+    key = id(result)
+    if key not in result_cards:
+        result_cards[key] = ResultCard(result)
+    return result_cards[key]
+
+# おみくじを引く関数（count: 引く枚数）
+def draw_omikuji(count=1):
     game.state = "drawing"
+    game.draw_count = count
     game.animation_timer = 0
     game.shake_amount = 0
-    game.paper_y = -300
-    game.paper_speed = 0
-    game.paper_rotation = 0
-    game.paper_scale = 0.1
     game.result_alpha = 0
-    game.particles = []
-    game.result = None
-    
-    # 3連引きの場合は空の配列を作成、通常引きの場合はNoneに設定
-    if triple:
-        game.triple_results = []  # 空の配列で初期化
-        game.current_triple_index = 0
-        print("3連引きモード開始")
+    game.current_index = 0
+    game.total_points = 0
+    game.particles.clear()
+    
+    # 結果は最初にまとめて決めておく（アニメーションは決まった結果を見せるだけ）
+    indices = [fortune_table.draw_index() for _ in range(count)]
+    game.results = [fortune_table[i] for i in indices]
+    history.record(indices, count)
+    game.cards = []
+    print(f"{count}連引きモード開始" if count > 1 else "通常引きモード開始")
+    
+    # リセットした値から補間を始める
+    game.save_previous()
+
+# 引き終わった（またはスキップした）ときに結果画面へ進む
+def finish_drawing():
+    game.cards = [get_result_card(result) for result in game.results]
+    game.animation_timer = 0
+    game.shake_amount = 0
+    game.result_alpha = 0
+    game.current_index = 0
+    if game.draw_count > 1:
+        game.total_points = total_points(game.results)
+        game.total_odds = score_odds.distribution(game.draw_count).at_least(game.total_points)
+        print(f"{game.draw_count}連引き完了:", [r["result"] for r in game.results])
+        game.state = "multi_result"
     else:
-        game.triple_results = None  # 通常引きの場合はNoneに設定
-        print("通常引きモード開始")
+        game.state = "result"
+    game.save_previous()
 
 # おみくじ箱を描画する関数
-def draw_omikuji_box(x, y, width, height, shake=0, is_title=False):
+def draw_omikuji_box(x, y, width, height, shake=0, is_title=False, surface=None):
+    # 描画先（省略時は画面、静的レイヤーを作るときはその画像）
+    if surface is None:
+        surface = screen
+    
     # 箱の位置をシェイク量に応じて調整
     box_x = x
     if shake > 0:
@@ -257,44 +1026,43 @@ def draw_omikuji_box(x, y, width, height, shake=0, is_title=False):
         for i in range(5):
             offset = i * 2
             shade = max(0, 205 - i * 10)  # だんだん暗くなる
-            pygame.draw.rect(screen, (shade, shade * 0.65, shade * 0.3), 
+            pygame.draw.rect(surface, (shade, shade * 0.65, shade * 0.3), 
                            (box_x + offset, y + offset, width - offset*2, height - offset*2), 0, 15)
         
         # 箱の縁取り - 金色の装飾
-        pygame.draw.rect(screen, GOLD, (box_x, y, width, height), 5, 15)
-        pygame.draw.rect(screen, (100, 50, 0), (box_x + 3, y + 3, width - 6, height - 6), 2, 15)
+        touched = [pygame.draw.rect(surface, GOLD, (box_x, y, width, height), 5, 15)]
+        pygame.draw.rect(surface, (100, 50, 0), (box_x + 3, y + 3, width - 6, height - 6), 2, 15)
         
         # 箱の装飾パターン - 和風の模様
         current_time = pygame.time.get_ticks()
-        for i in range(4):
-            for j in range(3):
-                pattern_x = box_x + width * (i + 1) / 5
-                pattern_y = y + height * (j + 1) / 4
-                pattern_size = 8 + math.sin(current_time * 0.001 + i * j) * 2
-                pygame.draw.circle(screen, (180, 120, 40), (pattern_x, pattern_y), pattern_size)
-                pygame.draw.circle(screen, (220, 180, 80), (pattern_x, pattern_y), pattern_size * 0.6)
+        for (i, j), (pattern_size, inner_size) in zip(BOX_PATTERN_CELLS, curves.box_patterns.at(current_time)):
+            pattern_x = box_x + width * (i + 1) / 5
+            pattern_y = y + height * (j + 1) / 4
+            sprite_batch.circle((((180, 120, 40), int(pattern_size)), ((220, 180, 80), int(inner_size))),
+                                (pattern_x, pattern_y))
+        sprite_batch.flush(surface)
         
         # 箱の上部 - 豪華な屋根
         roof_height = 40
-        pygame.draw.polygon(screen, (160, 80, 30), [
+        pygame.draw.polygon(surface, (160, 80, 30), [
             (box_x - 20, y),
             (box_x + width + 20, y),
             (box_x + width * 0.8, y - roof_height),
             (box_x + width * 0.2, y - roof_height)
         ])
-        pygame.draw.polygon(screen, (100, 50, 0), [
+        touched.append(pygame.draw.polygon(surface, (100, 50, 0), [
             (box_x - 20, y),
             (box_x + width + 20, y),
             (box_x + width * 0.8, y - roof_height),
             (box_x + width * 0.2, y - roof_height)
-        ], 3)
+        ], 3))
         
         # 屋根の装飾
-        pygame.draw.line(screen, GOLD, 
+        pygame.draw.line(surface, GOLD, 
                        (box_x + width * 0.5, y - roof_height), 
                        (box_x + width * 0.5, y - roof_height * 1.3), 4)
-        pygame.draw.circle(screen, GOLD, 
-                         (box_x + width * 0.5, y - roof_height * 1.4), 8)
+        touched.append(pygame.draw.circle(surface, GOLD, 
+                                          (box_x + width * 0.5, y - roof_height * 1.4), 8))
         
         # 箱の中の穴 - 神秘的な光を放つ
         hole_color = (40, 20, 0)
@@ -305,44 +1073,45 @@ def draw_omikuji_box(x, y, width, height, shake=0, is_title=False):
         
         # 穴の周りに光の効果
         glow_radius = 20 + math.sin(current_time * 0.002) * 5
-        for r in range(int(glow_radius), 0, -2):
+        for r in range(int(glow_radius), 0, -quality.tier.glow_step):
             alpha = 150 - r * 5
             if alpha > 0:
-                s = pygame.Surface((hole_width + r*2, hole_height + r*2), pygame.SRCALPHA)
-                pygame.draw.ellipse(s, (255, 200, 100, alpha), 
-                                  (0, 0, hole_width + r*2, hole_height + r*2))
-                screen.blit(s, (hole_x - r, hole_y - r))
+                s = glow_atlas.ellipse(hole_width + r*2, hole_height + r*2, (255, 200, 100), alpha)
+                touched.append(surface.blit(s, (hole_x - r, hole_y - r)))
         
         # 穴本体
-        pygame.draw.ellipse(screen, hole_color, (hole_x, hole_y, hole_width, hole_height))
+        pygame.draw.ellipse(surface, hole_color, (hole_x, hole_y, hole_width, hole_height))
         
         # おみくじの棒が少し見える
         stick_count = 5
         for i in range(stick_count):
             stick_x = hole_x + hole_width * (i + 1) / (stick_count + 1)
             stick_height = random.randint(10, 25)
-            pygame.draw.line(screen, (240, 230, 210), 
+            pygame.draw.line(surface, (240, 230, 210), 
                            (stick_x, hole_y + hole_height * 0.3),
                            (stick_x, hole_y + hole_height * 0.3 - stick_height), 3)
     else:
         # 通常のおみくじ箱（ゲームプレイ中）
         # 箱の本体
-        pygame.draw.rect(screen, LIGHT_BROWN, (box_x, y, width, height))
-        pygame.draw.rect(screen, (100, 50, 0), (box_x, y, width, height), 5)
+        touched = [pygame.draw.rect(surface, LIGHT_BROWN, (box_x, y, width, height))]
+        pygame.draw.rect(surface, (100, 50, 0), (box_x, y, width, height), 5)
         
         # 箱の装飾
-        pygame.draw.rect(screen, (180, 100, 50), (box_x + width/4, y - 20, width/2, 20))
-        pygame.draw.rect(screen, (100, 50, 0), (box_x + width/4, y - 20, width/2, 20), 3)
+        touched.append(pygame.draw.rect(surface, (180, 100, 50), (box_x + width/4, y - 20, width/2, 20)))
+        pygame.draw.rect(surface, (100, 50, 0), (box_x + width/4, y - 20, width/2, 20), 3)
         
         # 箱の中の穴
         hole_color = (50, 25, 0)
-        pygame.draw.ellipse(screen, hole_color, (box_x + width/4, y + 30, width/2, height/3))
+        pygame.draw.ellipse(surface, hole_color, (box_x + width/4, y + 30, width/2, height/3))
+    
+    # 描画した範囲を返す（ダーティ矩形モード用）
+    return touched[0].unionall(touched[1:])
 
-# 3連引きの進行状況を表示するテキスト
-def draw_triple_progress_text(screen, current_count):
+# 複数引きの進行状況を表示するテキスト
+def draw_progress_text(screen, current_count, total_count):
     # 和風の装飾付きテキスト背景
-    text = f"{current_count}/3回目"
-    progress_text = font_small.render(text, True, (100, 60, 20))
+    text = f"{current_count}/{total_count}回目"
+    progress_text = text_cache.render(assets.font_small, text, True, (100, 60, 20))
     
     # 背景の装飾枠
     text_width = progress_text.get_width()
@@ -371,434 +1140,861 @@ def draw_triple_progress_text(screen, current_count):
     
     # テキストを描画
     screen.blit(progress_text, (WIDTH - text_width - padding - 10, 20 + padding//2))
+    
+    return bg_rect
 
 # 装飾的な和風の背景要素を描画する関数
 def draw_decorative_elements(screen):
     # 桜の花びらのような装飾
     current_time = pygame.time.get_ticks()
-    for i in range(8):
-        x = (current_time // 50 + i * 200) % (WIDTH + 100) - 50
-        y = HEIGHT - 100 + math.sin(current_time * 0.001 + i) * 20
-        size = 20 + math.sin(current_time * 0.002 + i * 0.5) * 5
-        pygame.draw.circle(screen, (255, 230, 240), (int(x), int(y)), int(size))
-        pygame.draw.circle(screen, (255, 200, 220), (int(x), int(y)), int(size * 0.7))
+    stride = quality.tier.decoration_stride
+    for i, (y, size, inner_size) in enumerate(curves.petals.at(current_time)[::stride]):
+        x = (current_time // 50 + i * stride * 200) % (WIDTH + 100) - 50
+        sprite_batch.circle((((255, 230, 240), size), ((255, 200, 220), inner_size)), (x, y))
     
     # 上部の装飾
-    for i in range(6):
-        x = (current_time // 70 + i * 180) % (WIDTH + 100) - 50
-        y = 50 + math.sin(current_time * 0.001 + i) * 10
-        size = 15 + math.sin(current_time * 0.002 + i * 0.5) * 3
-        pygame.draw.circle(screen, (230, 255, 240), (int(x), int(y)), int(size))
-        pygame.draw.circle(screen, (200, 240, 220), (int(x), int(y)), int(size * 0.7))
+    for i, (y, size, inner_size) in enumerate(curves.top_decorations.at(current_time)[::stride]):
+        x = (current_time // 70 + i * stride * 180) % (WIDTH + 100) - 50
+        sprite_batch.circle((((230, 255, 240), size), ((200, 240, 220), inner_size)), (x, y))
     
-    # 和風の装飾ライン
-    line_y = HEIGHT - 30
-    line_wave = math.sin(current_time * 0.001) * 5
-    points = []
-    for x in range(0, WIDTH, 20):
-        y = line_y + math.sin(x * 0.05 + current_time * 0.001) * 5
-        points.append((x, y))
+    # 花びらと上部の装飾は1回の blits() で描く
+    touched = sprite_batch.flush(screen)
     
+    # 和風の装飾ライン
+    points = curves.wave.at(current_time)
     if len(points) > 1:
-        pygame.draw.lines(screen, (150, 100, 50), False, points, 2)
-
-# メインループ
-clock = pygame.time.Clock()
-running = True
-
-while running:
-    mouse_pos = pygame.mouse.get_pos()
-    mouse_click = False
+        touched.append(pygame.draw.lines(screen, (150, 100, 50), False, points, 2))
     
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            running = False
-        if event.type == pygame.MOUSEBUTTONDOWN:
-            if event.button == 1:  # 左クリック
-                mouse_click = True
-    
-    # 和紙風の背景を描画
-    screen.blit(background_texture, (0, 0))
+    return touched
+
+# タイトルの装飾枠を描画する関数
+def draw_title_frame(surface):
+    # 影付きの装飾枠
+    frame_rect = TITLE_FRAME_RECT
+    pygame.draw.rect(surface, (220, 200, 180), frame_rect, border_radius=15)
+    pygame.draw.rect(surface, (150, 100, 50), frame_rect, 4, border_radius=15)
     
-    # 装飾的な背景要素を描画
-    draw_decorative_elements(screen)
+    # 装飾的な角の模様
+    corner_size = 15
+    pygame.draw.line(surface, (150, 100, 50), (frame_rect.left + 5, frame_rect.top + corner_size), 
+                    (frame_rect.left + corner_size, frame_rect.top + 5), 3)
+    pygame.draw.line(surface, (150, 100, 50), (frame_rect.right - 5, frame_rect.top + corner_size), 
+                    (frame_rect.right - corner_size, frame_rect.top + 5), 3)
+    pygame.draw.line(surface, (150, 100, 50), (frame_rect.left + 5, frame_rect.bottom - corner_size), 
+                    (frame_rect.left + corner_size, frame_rect.bottom - 5), 3)
+    pygame.draw.line(surface, (150, 100, 50), (frame_rect.right - 5, frame_rect.bottom - corner_size), 
+                    (frame_rect.right - corner_size, frame_rect.bottom - 5), 3)
+    return frame_rect
+
+# 1秒あたりのシミュレーションのステップ数（アニメーションはステップ単位で進む）
+SIM_HZ = 60
+SIM_DT = 1.0 / SIM_HZ
+
+# 固定ステップのシミュレーション（描画のフレームレートに関係なく一定の速さで進める）
+class FixedTimestep:
+    def __init__(self, step=SIM_DT, max_steps=5):
+        self.step = step
+        self.max_steps = max_steps  # 1フレームで追いつくステップ数の上限
+        self.accumulator = 0.0
+        self.alpha = 0.0  # 描画の補間率（0〜1）
+        self.dropped = 0.0  # 追いつけずに捨てた時間（秒）
+        
+    def advance(self, frame_time):
+        # 経過時間をためて、実行するステップ数を返す
+        self.accumulator += frame_time
+        steps = int(self.accumulator / self.step)
+        self.accumulator -= steps * self.step
+        if steps > self.max_steps:
+            # 処理が重くて追いつけない分は捨てる（遅れが雪だるま式に増えるのを防ぐ）
+            self.dropped += (steps - self.max_steps) * self.step
+            steps = self.max_steps
+        self.alpha = self.accumulator / self.step
+        return steps
+        
+    def reset(self):
+        self.accumulator = 0.0
+        self.alpha = 0.0
+
+timestep = FixedTimestep()
+
+# 画質の段階（処理が重いときは演出を減らしてフレームレートを保つ）
+class QualityTier:
+    def __init__(self, name, particle_rate, glow_step, ray_dot_stride, decoration_stride):
+        self.name = name
+        self.particle_rate = particle_rate  # パーティクルの発生量の倍率
+        self.glow_step = glow_step  # 箱の穴の光の輪の間隔（px）
+        self.ray_dot_stride = ray_dot_stride  # 光線の点を何個おきに描くか
+        self.decoration_stride = decoration_stride  # 花びら・背景の点を何個おきに描くか
+
+QUALITY_TIERS = [
+    QualityTier("high", 1.0, 2, 1, 1),
+    QualityTier("medium", 0.6, 4, 2, 2),
+    QualityTier("low", 0.3, 8, 3, 3),
+]
+
+# フレームの処理時間の移動平均を見て画質の段階を切り替える
+# 下げる・上げるしきい値を離し、切り替えた直後はしばらく様子を見る（行ったり来たりしないように）
+class QualityGovernor:
+    def __init__(self, tiers=QUALITY_TIERS, budget=SIM_DT, window=60, downgrade_at=0.85,
+                 upgrade_at=0.5, cooldown=120):
+        self.tiers = tiers
+        self.budget = budget  # 1フレームに使える時間（秒）
+        self.window = window
+        self.downgrade_at = downgrade_at  # 平均が予算のこの割合を超えたら画質を下げる
+        self.upgrade_at = upgrade_at  # 平均が予算のこの割合を下回ったら画質を上げる
+        self.cooldown = cooldown  # 切り替えてから次に切り替えるまでの最小フレーム数
+        self.level = 0
+        self.pinned = False
+        self.changes = 0
+        self.reset()
+        
+    @property
+    def tier(self):
+        return self.tiers[self.level]
+        
+    def reset(self):
+        self.samples = []
+        self.total = 0.0
+        self.frames_since_change = 0
+        
+    # 画質を固定する（name が None なら自動に戻す）
+    def pin(self, name):
+        self.pinned = name is not None
+        if name is not None:
+            self.level = [tier.name for tier in self.tiers].index(name)
+        self.reset()
+        
+    # 1フレームの処理時間（秒）を記録して、必要なら画質を切り替える
+    def observe(self, work_time):
+        if self.pinned:
+            return
+        self.samples.append(work_time)
+        self.total += work_time
+        if len(self.samples) > self.window:
+            self.total -= self.samples.pop(0)
+        self.frames_since_change += 1
+        if len(self.samples) < self.window or self.frames_since_change < self.cooldown:
+            return
+        
+        average = self.total / len(self.samples)
+        if average > self.budget * self.downgrade_at and self.level < len(self.tiers) - 1:
+            self.change(self.level + 1, average)
+        elif average < self.budget * self.upgrade_at and self.level > 0:
+            self.change(self.level - 1, average)
+            
+    def change(self, level, average):
+        self.level = level
+        self.changes += 1
+        self.reset()
+        print(f"画質を {self.tier.name} に変更しました（平均 {average * 1000:.1f} ms / フレーム）")
+
+quality = QualityGovernor()
+
+# 入力が無いときの省電力モード（キオスクでタイトル画面のまま長時間放置されたときなど）
+# idle_after 秒入力が無いと描画を idle_fps 回/秒に減らし、フレームの間は event.wait で眠る
+# （idle_fps が0なら入力が来るまで眠る）。入力が来たらすぐに通常の速さに戻る
+class IdleMode:
+    INPUT_EVENTS = (pygame.MOUSEMOTION, pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP, pygame.MOUSEWHEEL,
+                    pygame.KEYDOWN, pygame.KEYUP, pygame.FINGERDOWN, pygame.FINGERMOTION)
     
+    def __init__(self):
+        self.idle_after = float(os.environ.get("OMIKUJI_IDLE_AFTER", "60"))  # 0 なら省電力モードにしない
+        self.idle_fps = float(os.environ.get("OMIKUJI_IDLE_FPS", "10"))
+        self.last_input = time.monotonic()
+        self.sleeping = False
+        self.entered = 0  # 省電力モードに入った回数
+        # 通常時と省電力時の経過時間とCPU時間（秒）
+        self.wall = [0.0, 0.0]
+        self.cpu = [0.0, 0.0]
+        self.last_sample = None
+        
+    def wake(self):
+        self.last_input = time.monotonic()
+        
+    # このフレームを省電力モードで動かすか（おみくじを引いている途中は省電力にしない）
+    def active(self):
+        idle = (self.idle_after > 0 and game.state != "drawing"
+                and time.monotonic() - self.last_input >= self.idle_after)
+        if idle and not self.sleeping:
+            self.entered += 1
+        self.sleeping = idle
+        return idle
+        
+    # 次のフレームの時刻か入力が来るまで眠って、届いたイベントを返す
+    def wait(self):
+        event = pygame.event.wait(round(1000 / self.idle_fps) if self.idle_fps > 0 else 0)
+        if event.type == pygame.NOEVENT:
+            return pygame.event.get()
+        return [event] + pygame.event.get()
+        
+    # 1フレームごとに経過時間とCPU時間を、通常時か省電力時かに分けて足す
+    def sample(self):
+        now = (time.monotonic(), time.process_time())
+        if self.last_sample is not None:
+            index = 1 if self.sleeping else 0
+            self.wall[index] += now[0] - self.last_sample[0]
+            self.cpu[index] += now[1] - self.last_sample[1]
+        self.last_sample = now
+        
+    # 省電力モードで節約したCPU時間の報告（通常時と省電力時の両方の時間が無ければ None）
+    def report(self):
+        if self.wall[0] <= 0 or self.wall[1] <= 0:
+            return None
+        active_rate = self.cpu[0] / self.wall[0]
+        idle_rate = self.cpu[1] / self.wall[1]
+        saved = (active_rate - idle_rate) * self.wall[1]
+        per_hour = saved / (self.wall[0] + self.wall[1]) * 3600
+        return (f"省電力モード: {self.entered} 回 / 時間の {self.wall[1] / (self.wall[0] + self.wall[1]):.0%}"
+                f" / CPU使用率 通常 {active_rate:.0%} → 省電力 {idle_rate:.0%}"
+                f"（1時間あたり {per_hour:.0f} 秒のCPU時間を節約、省電力中は1時間あたり"
+                f" {(active_rate - idle_rate) * 3600:.0f} 秒）")
+
+idle = IdleMode()
+
+# 入力の処理（フレームごとに1回）
+def handle_input(mouse_pos, mouse_click):
     # タイトル画面
     if game.state == "title":
-        # 背景に和風の装飾を追加
-        for i in range(0, WIDTH, 50):
-            for j in range(0, HEIGHT, 50):
-                if (i + j) % 100 == 0:
-                    size = 3 + math.sin(pygame.time.get_ticks() * 0.001 + i * 0.1 + j * 0.1) * 2
-                    pygame.draw.circle(screen, (245, 240, 220), (i, j), size)
+        # ボタンを下部に配置
+        assets.draw_button.rect.center = (WIDTH//2 - 160, HEIGHT - 100)
+        assets.multi_button.rect.center = (WIDTH//2 + 160, HEIGHT - 100)
         
-        # おみくじ箱を描画 - 右側に配置（タイトル画面用の豪華バージョン）
-        box_x = WIDTH - 350
-        box_y = HEIGHT//2 - 150
-        draw_omikuji_box(box_x, box_y, 300, 250, shake=0, is_title=True)
+        assets.stats_button.rect.center = (WIDTH//2, HEIGHT - 32)
         
-        # おみくじ箱から出る光の効果
-        current_time = pygame.time.get_ticks()
-        light_points = 8
-        for i in range(light_points):
-            angle = i * (2 * math.pi / light_points) + current_time * 0.0005
-            length = 50 + math.sin(current_time * 0.001 + i) * 20
-            start_x = box_x + 150
-            start_y = box_y + 100
-            end_x = start_x + math.cos(angle) * length
-            end_y = start_y + math.sin(angle) * length
-            
-            # グラデーションの光線
-            for j in range(10):
-                progress = j / 10
-                point_x = start_x + (end_x - start_x) * progress
-                point_y = start_y + (end_y - start_y) * progress
-                size = 5 * (1 - progress)
-                alpha = int(200 * (1 - progress))
-                s = pygame.Surface((size*2, size*2), pygame.SRCALPHA)
-                pygame.draw.circle(s, (255, 220, 100, alpha), (size, size), size)
-                screen.blit(s, (point_x - size, point_y - size))
+        assets.draw_button.check_hover(mouse_pos)
+        assets.multi_button.check_hover(mouse_pos)
+        assets.stats_button.check_hover(mouse_pos)
         
-        # タイトルテキストをアニメーション（左側に配置、和風デザイン）
-        title_y_offset = math.sin(pygame.time.get_ticks() * 0.002) * 8
-        
-        # 影付きの装飾枠
-        frame_rect = pygame.Rect(50, HEIGHT//4 - 30, 350, 120)
-        pygame.draw.rect(screen, (220, 200, 180), frame_rect, border_radius=15)
-        pygame.draw.rect(screen, (150, 100, 50), frame_rect, 4, border_radius=15)
-        
-        # 装飾的な角の模様
-        corner_size = 15
-        pygame.draw.line(screen, (150, 100, 50), (frame_rect.left + 5, frame_rect.top + corner_size), 
-                        (frame_rect.left + corner_size, frame_rect.top + 5), 3)
-        pygame.draw.line(screen, (150, 100, 50), (frame_rect.right - 5, frame_rect.top + corner_size), 
-                        (frame_rect.right - corner_size, frame_rect.top + 5), 3)
-        pygame.draw.line(screen, (150, 100, 50), (frame_rect.left + 5, frame_rect.bottom - corner_size), 
-                        (frame_rect.left + corner_size, frame_rect.bottom - 5), 3)
-        pygame.draw.line(screen, (150, 100, 50), (frame_rect.right - 5, frame_rect.bottom - corner_size), 
-                        (frame_rect.right - corner_size, frame_rect.bottom - 5), 3)
-        
-        # タイトルテキスト
-        title_text = font_large.render("おみくじゲーム", True, (120, 60, 30))
-        screen.blit(title_text, (frame_rect.centerx - title_text.get_width()//2, 
-                                frame_rect.centery - title_text.get_height()//2 + title_y_offset))
-        
-        # サブタイトル
-        subtitle_text = font_small.render("～運命の神様～", True, (150, 100, 50))
-        screen.blit(subtitle_text, (frame_rect.centerx - subtitle_text.get_width()//2, 
-                                    frame_rect.bottom + 10))
+        if assets.draw_button.is_clicked(mouse_pos, mouse_click):
+            draw_omikuji(1)
+            
+        if assets.multi_button.is_clicked(mouse_pos, mouse_click):
+            draw_omikuji(MULTI_DRAW_COUNT)
+            
+        if assets.stats_button.is_clicked(mouse_pos, mouse_click):
+            game.state = "stats"
+    
+    # 引いている途中（クリックでアニメーションを飛ばして結果へ）
+    elif game.state == "drawing":
+        if mouse_click:
+            finish_drawing()
+    
+    # 結果画面
+    elif game.state == "result":
+        assets.back_button.rect.center = (WIDTH//2, HEIGHT - 100)
+        assets.back_button.check_hover(mouse_pos)
         
-        # ボタンを下部に配置
-        draw_button.rect.center = (WIDTH//2 - 160, HEIGHT - 100)
-        triple_button.rect.center = (WIDTH//2 + 160, HEIGHT - 100)
+        if assets.back_button.is_clicked(mouse_pos, mouse_click):
+            game.state = "title"
+    
+    # 複数引きの結果画面
+    elif game.state == "multi_result":
+        # ナビゲーションボタンを下部に配置（重ならないように）
+        button_y = HEIGHT - 80
         
-        draw_button.check_hover(mouse_pos)
-        draw_button.draw(screen)
+        # 「タイトルに戻る」ボタンは中央下部に
+        assets.back_button.rect.center = (WIDTH//2, button_y)
+        assets.back_button.check_hover(mouse_pos)
         
-        triple_button.check_hover(mouse_pos)
-        triple_button.draw(screen)
+        # 「次へ」ボタンは右下に（最後の結果では表示しない）
+        if game.current_index < game.draw_count - 1:
+            assets.next_button.rect.center = (WIDTH * 3//4 + 50, button_y)
+            assets.next_button.check_hover(mouse_pos)
+            
+            if assets.next_button.is_clicked(mouse_pos, mouse_click):
+                game.current_index += 1
+                game.animation_timer = 0
+                game.result_alpha = 0
         
-        if draw_button.is_clicked(mouse_pos, mouse_click):
-            draw_omikuji(triple=False)
+        # 「前へ」ボタンは左下に（最初の結果では表示しない）
+        if game.current_index > 0:
+            assets.prev_button.rect.center = (WIDTH//4 - 50, button_y)
+            assets.prev_button.check_hover(mouse_pos)
             
-        if triple_button.is_clicked(mouse_pos, mouse_click):
-            draw_omikuji(triple=True)
+            if assets.prev_button.is_clicked(mouse_pos, mouse_click):
+                game.current_index -= 1
+                game.animation_timer = 0
+                game.result_alpha = 0
+        
+        if assets.back_button.is_clicked(mouse_pos, mouse_click):
+            game.state = "title"
+            game.total_points = 0  # ポイントをリセット（履歴の集計には残っている）
+    
+    # 記録の画面
+    elif game.state == "stats":
+        assets.back_button.rect.center = (WIDTH//2, HEIGHT - 70)
+        assets.back_button.check_hover(mouse_pos)
+        
+        if assets.back_button.is_clicked(mouse_pos, mouse_click):
+            game.state = "title"
+
+# シミュレーションを1ステップ進める
+def step_simulation():
+    game.save_previous()
+    
+    for button in assets.buttons.values():
+        button.update()
     
     # おみくじを引いている途中
-    elif game.state == "drawing":
+    if game.state == "drawing":
         game.animation_timer += 1
         
-        # シェイクアニメーション
-        if game.animation_timer < 60:
+        # シェイクアニメーション（最後の紙が出てくる少し前まで揺らし続ける）
+        shake_end = paper_launch(game.draw_count - 1) - 30
+        if game.animation_timer < shake_end:
             game.shake_amount = min(10, game.animation_timer / 6)
         else:
-            game.shake_amount = max(0, 10 - (game.animation_timer - 60) / 3)
-        
-        # おみくじ箱を描画（シェイク効果付き）
-        draw_omikuji_box(WIDTH//2 - 150, HEIGHT//2 - 200, 300, 250, game.shake_amount, is_title=False)
-        
-        # 3連引きの場合、進行状況を表示
-        if game.triple_results is not None and len(game.triple_results) < 3:
-            draw_triple_progress_text(screen, len(game.triple_results) + 1)
+            game.shake_amount = max(0, 10 - (game.animation_timer - shake_end) / 3)
         
         # パーティクル効果（箱が揺れているときに発生）
-        if game.shake_amount > 5 and random.random() < 0.3:
+        if game.shake_amount > 5 and random.random() < 0.3 * quality.tier.particle_rate:
             box_center_x = WIDTH//2
             box_bottom_y = HEIGHT//2 + 50
             for _ in range(2):
                 particle_color = random.choice([RED, GREEN, BLUE, GOLD, ORANGE, PURPLE])
-                game.particles.append(Particle(box_center_x, box_bottom_y, particle_color))
-        
-        # パーティクルの更新と描画
-        for particle in game.particles[:]:
-            particle.update()
-            if particle.life <= 0:
-                game.particles.remove(particle)
-            else:
-                particle.draw(screen)
-        
-        # アニメーション（おみくじ紙が出てくる）
-        if game.animation_timer > 90:  # 約1.5秒後
-            # 結果がまだ決まっていない場合
-            if not game.result:
-                game.result = random.choice(omikuji_results)
-                
-                # 3連引きモードの場合、結果を配列に追加
-                if game.triple_results is not None:
-                    game.triple_results.append(game.result)
-                    print(f"結果を追加: {game.result['result']}, 現在 {len(game.triple_results)} 枚")
-            
-            # おみくじ紙が箱から出てくるアニメーション
-            if game.paper_y < HEIGHT//2 - 50:
-                game.paper_speed += 0.5
-                game.paper_y += game.paper_speed
-                game.paper_rotation += 5
-                game.paper_scale = min(1.0, game.paper_scale + 0.05)
-            else:
-                # 3連引きモードの場合
-                if game.triple_results is not None:
-                    if len(game.triple_results) < 3:
-                        # まだ3回引いていない場合、次の引きへ
-                        print(f"3連引き中: {len(game.triple_results)}回目完了")
-                        game.state = "drawing"
-                        game.animation_timer = 0
-                        game.shake_amount = 0
-                        game.paper_y = -300
-                        game.paper_speed = 0
-                        game.paper_rotation = 0
-                        game.paper_scale = 0.1
-                        game.result = None
-                    else:
-                        # 3回引き終わった場合、結果画面へ
-                        print("3連引き完了:", [r["result"] for r in game.triple_results])
-                        game.state = "triple_result"
-                        game.animation_timer = 0
-                        game.current_triple_index = 0
-                        game.result_alpha = 0
-                else:
-                    # 通常の1回引きの場合
-                    game.state = "result"
-                    game.animation_timer = 0
-            
-            # おみくじ紙を描画
-            paper_surface = pygame.Surface((300, 150), pygame.SRCALPHA)
-            pygame.draw.rect(paper_surface, (255, 250, 240), (0, 0, 300, 150), border_radius=10)
-            pygame.draw.rect(paper_surface, BLACK, (0, 0, 300, 150), 2, border_radius=10)
-            
-            # 紙を回転・拡大縮小して描画
-            scaled_paper = pygame.transform.rotozoom(paper_surface, game.paper_rotation, game.paper_scale)
-            paper_rect = scaled_paper.get_rect(center=(WIDTH//2, game.paper_y))
-            screen.blit(scaled_paper, paper_rect)
+                game.particles.emit(box_center_x, box_bottom_y, particle_color)
+        
+        # パーティクルの更新
+        game.particles.update()
         
-        drawing_text = font_medium.render("おみくじを引いています...", True, BLACK)
-        screen.blit(drawing_text, (WIDTH//2 - drawing_text.get_width()//2, HEIGHT//2 + 150))
+        # すべての紙が止まったら結果画面へ
+        if game.animation_timer >= drawing_steps(game.draw_count):
+            finish_drawing()
     
     # 結果画面
-    elif game.state == "result":
+    elif game.state in ("result", "multi_result"):
         game.animation_timer += 1
-        
-        # おみくじ箱を描画
-        draw_omikuji_box(WIDTH//2 - 150, HEIGHT//2 - 300, 300, 250, is_title=False)
-        
-        # おみくじの紙 - 白っぽい背景
-        paper_color = (255, 250, 240)
-        
-        # 紙の位置と回転のアニメーション
-        paper_y_offset = math.sin(pygame.time.get_ticks() * 0.003) * 5
-        paper_rotation = math.sin(pygame.time.get_ticks() * 0.002) * 2
-        
-        # 回転した紙を描画
-        paper_surface = pygame.Surface((400, 200), pygame.SRCALPHA)
-        pygame.draw.rect(paper_surface, paper_color, (0, 0, 400, 200), border_radius=10)
-        pygame.draw.rect(paper_surface, BLACK, (0, 0, 400, 200), 2, border_radius=10)
-        
-        rotated_paper = pygame.transform.rotate(paper_surface, paper_rotation)
-        paper_rect = rotated_paper.get_rect(center=(WIDTH//2, HEIGHT//2 + paper_y_offset))
-        screen.blit(rotated_paper, paper_rect)
+        current_card = game.cards[game.current_index]
         
         # 結果テキストのフェードイン
         if game.animation_timer < 30:
             game.result_alpha = min(255, game.result_alpha + 8)
         
-        # 結果テキスト - 常に黒で表示して視認性を確保
-        result_text = font_large.render(game.result["result"], True, BLACK)
-        result_text.set_alpha(game.result_alpha)
-        
-        # 色付きの円で運勢を表現（パルス効果）- サイズを小さくして結果に連動
-        # 結果のポイントに応じて基本サイズを変更（大吉ほど大きく）
-        base_size = 10 + min(5, abs(game.result["points"])) * 1.2
-        # アニメーションをおみくじの結果と連動させる（ポイントが高いほど速く動く）
-        anim_speed = 0.01 + abs(game.result["points"]) * 0.002
-        circle_size = base_size + math.sin(pygame.time.get_ticks() * anim_speed) * 2
-        fortune_color = game.result["color"]
-        # 紙の動きに合わせて円も動くように
-        circle_y_offset = paper_y_offset + math.sin(pygame.time.get_ticks() * 0.003) * 3
-        pygame.draw.circle(screen, fortune_color, (WIDTH//2, HEIGHT//2 - 70 + circle_y_offset), circle_size)
-        pygame.draw.circle(screen, BLACK, (WIDTH//2, HEIGHT//2 - 70 + circle_y_offset), circle_size, 2)
-        
-        desc_text = font_small.render(game.result["description"], True, BLACK)
-        desc_text.set_alpha(game.result_alpha)
-        
-        # ポイント表示
-        points = game.result["points"]
-        points_text = font_medium.render(f"{points:+d} pt", True, 
-                                        (50, 180, 50) if points >= 0 else (180, 50, 50))
-        points_text.set_alpha(game.result_alpha)
-        
         # 結果に応じたパーティクル効果
         if game.animation_timer < 60 and game.animation_timer % 5 == 0:
-            for _ in range(3):
+            for _ in range(max(1, round(3 * quality.tier.particle_rate))):
                 particle_x = WIDTH//2 + random.uniform(-150, 150)
                 particle_y = HEIGHT//2 + random.uniform(-50, 50)
-                game.particles.append(Particle(particle_x, particle_y, game.result["color"]))
-        
-        # パーティクルの更新と描画
-        for particle in game.particles[:]:
-            particle.update()
-            if particle.life <= 0:
-                game.particles.remove(particle)
-            else:
-                particle.draw(screen)
-        
-        # テキストを紙の上に描画
-        text_y_offset = paper_y_offset  # 紙と同じオフセットを適用
-        screen.blit(result_text, (WIDTH//2 - result_text.get_width()//2, HEIGHT//2 - 30 + text_y_offset))
-        screen.blit(desc_text, (WIDTH//2 - desc_text.get_width()//2, HEIGHT//2 + 20 + text_y_offset))
-        screen.blit(points_text, (WIDTH//2 - points_text.get_width()//2, HEIGHT//2 + 50 + text_y_offset))
-        
-        back_button.rect.center = (WIDTH//2, HEIGHT - 100)
-        back_button.check_hover(mouse_pos)
-        back_button.draw(screen)
-        
-        if back_button.is_clicked(mouse_pos, mouse_click):
-            game.state = "title"
-            
-    # 3連結果画面
-    elif game.state == "triple_result":
-        game.animation_timer += 1
+                game.particles.emit(particle_x, particle_y, current_card.color)
         
-        # おみくじ箱を描画（上部に小さく）
-        draw_omikuji_box(WIDTH//2 - 100, HEIGHT//4 - 100, 200, 150, is_title=False)
-        
-        # 現在表示中の結果
-        current_result = game.triple_results[game.current_triple_index]
-        
-        # おみくじの紙 - 白っぽい背景
-        paper_color = (255, 250, 240)
-        
-        # 紙の位置と回転のアニメーション
-        paper_y_offset = math.sin(pygame.time.get_ticks() * 0.003) * 5
-        paper_rotation = math.sin(pygame.time.get_ticks() * 0.002) * 2
-        
-        # 回転した紙を描画
-        paper_surface = pygame.Surface((400, 200), pygame.SRCALPHA)
-        pygame.draw.rect(paper_surface, paper_color, (0, 0, 400, 200), border_radius=10)
-        pygame.draw.rect(paper_surface, BLACK, (0, 0, 400, 200), 2, border_radius=10)
-        
-        rotated_paper = pygame.transform.rotate(paper_surface, paper_rotation)
+        # パーティクルの更新
+        game.particles.update()
+
+# 複数引きの結果画面でインジケーターを点で表示する最大の枚数
+MAX_INDICATOR_DOTS = 15
+INDICATOR_Y = HEIGHT//2 + 80
+
+# インジケーターの i 番目の点の x 座標
+def indicator_x(i, count):
+    return WIDTH//2 + (i - (count - 1) / 2) * 30
+
+# 選択されていないインジケーターの点を全て描画する関数（選択中の点はこの上に重ねて描く）
+def draw_indicator_dots(surface, count):
+    touched = []
+    for i in range(count):
+        position = (indicator_x(i, count), INDICATOR_Y)
+        touched.append(pygame.draw.circle(surface, (200, 200, 200), position, 6))
+        pygame.draw.circle(surface, BLACK, position, 6, 1)
+    return touched[0].unionall(touched[1:])
+
+# 記録の画面の表の範囲
+STATS_PANEL_RECT = pygame.Rect(80, 30, 640, 445)
+# 記録の画面に並べる運勢の行数（運勢表が多いときは回数の多い順に並べ、残りは「その他」の1行にまとめる）
+STATS_MAX_ROWS = 7
+STATS_OTHER_COLOR = (170, 160, 150)
+
+# 抽選履歴の集計を表にして描画する関数（session: この起動中のセッションの番号）
+def draw_stats_panel(surface, stats, session):
+    panel = STATS_PANEL_RECT
+    pygame.draw.rect(surface, (255, 250, 240), panel, border_radius=15)
+    pygame.draw.rect(surface, (150, 100, 50), panel, 3, border_radius=15)
+    
+    title_text = text_cache.render(assets.font_medium, "おみくじの記録", True, (120, 60, 30))
+    surface.blit(title_text, (panel.centerx - title_text.get_width()//2, panel.top + 15))
+    
+    text_color = (100, 60, 20)
+    if stats.draws == 0:
+        empty_text = text_cache.render(assets.font_small, "まだ記録がありません", True, text_color)
+        surface.blit(empty_text, empty_text.get_rect(center=panel.center))
+        return panel
+    
+    # 合計
+    summary = f"合計 {stats.draws:,} 回  {stats.total_points:+,} pt (平均 {stats.total_points / stats.draws:+.2f} pt)"
+    summary_text = text_cache.render(assets.font_small, summary, True, text_color)
+    surface.blit(summary_text, (panel.centerx - summary_text.get_width()//2, panel.top + 70))
+    
+    # 運勢ごとの回数（一番多い運勢の棒が最大の長さ）
+    counts = [stats.counts[i] if i < len(stats.counts) else 0 for i in range(len(fortune_table))]
+    if len(counts) <= STATS_MAX_ROWS:
+        rows = [(entry["result"], entry["color"], count) for entry, count in zip(fortune_table, counts)]
+    else:
+        # 回数の多い順（同じ回数なら運勢表の順）に並べ、入りきらない分は「その他」にまとめる
+        shown = heapq.nlargest(STATS_MAX_ROWS - 1, range(len(counts)), key=counts.__getitem__)
+        rows = [(fortune_table[i]["result"], fortune_table[i]["color"], counts[i]) for i in shown]
+        rows.append(("その他", STATS_OTHER_COLOR, sum(counts) - sum(count for _, _, count in rows)))
+    most = max(count for _, _, count in rows) or 1
+    row_top = panel.top + 115
+    row_height = 32
+    bar_left = panel.left + 110
+    bar_width = 300
+    for i, (label, color, count) in enumerate(rows):
+        y = row_top + i * row_height
+        name_text = text_cache.render(assets.font_small, label, True, color)
+        # 長い名前は棒に重ならないように左側だけを表示する
+        surface.blit(name_text, (panel.left + 30, y), (0, 0, bar_left - panel.left - 35, row_height))
+        if count:
+            pygame.draw.rect(surface, color,
+                             (bar_left, y + 6, max(2, round(bar_width * count / most)), row_height - 12),
+                             border_radius=4)
+        count_text = text_cache.render(assets.font_small, f"{count:,} 回 ({count / stats.draws:.1%})", True, text_color)
+        surface.blit(count_text, (bar_left + bar_width + 15, y))
+    
+    # 連続記録とこの起動中の成績
+    def name(index):
+        return fortune_table[index]["result"] if 0 <= index < len(fortune_table) else "?"
+    streak = f"連続: {name(stats.streak_fortune)} {stats.streak} 回    最長: {name(stats.longest_fortune)} {stats.longest} 回"
+    streak_text = text_cache.render(assets.font_small, streak, True, text_color)
+    surface.blit(streak_text, (panel.centerx - streak_text.get_width()//2, panel.bottom - 75))
+    
+    session_draws, session_points = (stats.session_draws, stats.session_points) if stats.session == session else (0, 0)
+    session_text = text_cache.render(assets.font_small, f"今回: {session_draws} 回  {session_points:+d} pt", True, text_color)
+    surface.blit(session_text, (panel.centerx - session_text.get_width()//2, panel.bottom - 40))
+    return panel
+
+# 場面の静的レイヤー（その場面にいる間は変わらない部分を、場面に入ったときに1回だけ描いておく）
+# base: 背景と、動く要素より下にある静的な飾り（毎フレームこれを1回転送してから動く要素を描く）
+# sprites: 動く要素の間に重なる静的な部分（名前 → (画像, 位置)、描画順の位置で転送する）
+class SceneLayer:
+    def __init__(self, base):
+        self.base = base
+        self.sprites = {}
+        
+    def add_sprite(self, name, surface, position):
+        self.sprites[name] = (surface, position)
+        
+    # draw(画像) で透明な画像に描いて、描画した範囲だけを切り出して保持する
+    def capture(self, name, draw):
+        canvas = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
+        rect = draw(canvas).clip(canvas.get_rect())
+        self.add_sprite(name, canvas.subsurface(rect).copy(), rect.topleft)
+        
+    def blit(self, surface, name):
+        sprite, position = self.sprites[name]
+        return surface.blit(sprite, position)
+
+# 場面の静的レイヤーを作る
+def build_scene_layer(state):
+    layer = SceneLayer(assets.background_texture.copy())
+    
+    if state == "title":
+        # タイトルの装飾枠は背景に、サブタイトルは背景の点より上に重ねる
+        draw_title_frame(layer.base)
+        subtitle_text = text_cache.render(assets.font_small, "～運命の神様～", True, (150, 100, 50))
+        layer.add_sprite("subtitle", subtitle_text, (TITLE_FRAME_RECT.centerx - subtitle_text.get_width()//2,
+                                                     TITLE_FRAME_RECT.bottom + 10))
+    elif state == "drawing":
+        # 落ちてくる紙より上に表示するテキスト
+        drawing_text = text_cache.render(assets.font_medium, "おみくじを引いています...", True, BLACK)
+        layer.add_sprite("drawing_text", drawing_text, (WIDTH//2 - drawing_text.get_width()//2, HEIGHT//2 + 150))
+        skip_text = text_cache.render(assets.font_small, "クリックでスキップ", True, (150, 100, 50))
+        layer.add_sprite("skip_text", skip_text, (WIDTH//2 - skip_text.get_width()//2, HEIGHT//2 + 200))
+    elif state == "result":
+        # 揺れていない箱は変わらない（上部の装飾より上、紙より下に重ねる）
+        layer.capture("box", lambda surface: draw_omikuji_box(WIDTH//2 - 150, HEIGHT//2 - 300, 300, 250,
+                                                               surface=surface))
+    elif state == "multi_result":
+        layer.capture("box", lambda surface: draw_omikuji_box(WIDTH//2 - 100, HEIGHT//4 - 100, 200, 150,
+                                                               surface=surface))
+        if game.draw_count <= MAX_INDICATOR_DOTS:
+            layer.capture("indicator", lambda surface: draw_indicator_dots(surface, game.draw_count))
+    elif state == "stats":
+        layer.capture("panel", lambda surface: draw_stats_panel(surface, history.stats, history.session))
+    
+    return layer
+
+# 現在の場面の静的レイヤー（場面・枚数・画面の大きさが変わったら作り直す）
+class StaticLayers:
+    def __init__(self):
+        self.key = None
+        self.layer = None
+        self.builds = 0
+        
+    def invalidate(self):
+        self.key = None
+        
+    def get(self):
+        key = (game.state, game.draw_count if game.state == "multi_result" else 0, screen.get_size())
+        if key != self.key:
+            self.layer = build_scene_layer(game.state)
+            self.key = key
+            self.builds += 1
+            # 背景が変わるので、ダーティ矩形モードでも画面全体を描き直す
+            dirty.invalidate()
+        return self.layer
+
+static_layers = StaticLayers()
+
+# 結果のカード（紙・運勢の色の円・テキスト）を描画して、描画した範囲を返す
+def draw_result_card(card, alpha):
+    # 紙の位置と回転のアニメーション
+    paper_y_offset = math.sin(pygame.time.get_ticks() * 0.003) * 5
+    paper_rotation = math.sin(pygame.time.get_ticks() * 0.002) * 2
+    
+    # 回転した紙を描画（白っぽい背景）
+    with profiler.section("paper"):
+        paper_surface = get_paper_surface(400, 200, (255, 250, 240))
+        rotated_paper = transform_cache.rotate(paper_surface, paper_rotation)
         paper_rect = rotated_paper.get_rect(center=(WIDTH//2, HEIGHT//2 + paper_y_offset))
-        screen.blit(rotated_paper, paper_rect)
+        touched = [screen.blit(rotated_paper, paper_rect)]
         
-        # 結果テキストのフェードイン
-        if game.animation_timer < 30:
-            game.result_alpha = min(255, game.result_alpha + 8)
-        
-        # 結果テキスト - 常に黒で表示して視認性を確保
-        result_text = font_large.render(current_result["result"], True, BLACK)
-        result_text.set_alpha(game.result_alpha)
-        
-        # 色付きの円で運勢を表現（パルス効果）- サイズを小さくして結果に連動
-        # 結果のポイントに応じて基本サイズを変更（大吉ほど大きく）
-        base_size = 10 + min(5, abs(current_result["points"])) * 1.2
-        # アニメーションをおみくじの結果と連動させる（ポイントが高いほど速く動く）
-        anim_speed = 0.01 + abs(current_result["points"]) * 0.002
-        circle_size = base_size + math.sin(pygame.time.get_ticks() * anim_speed) * 2
-        fortune_color = current_result["color"]
+        # 色付きの円で運勢を表現（パルス効果）
+        circle_size = card.base_size + math.sin(pygame.time.get_ticks() * card.anim_speed) * 2
         # 紙の動きに合わせて円も動くように
         circle_y_offset = paper_y_offset + math.sin(pygame.time.get_ticks() * 0.003) * 3
-        pygame.draw.circle(screen, fortune_color, (WIDTH//2, HEIGHT//2 - 70 + circle_y_offset), circle_size)
+        touched.append(pygame.draw.circle(screen, card.color, (WIDTH//2, HEIGHT//2 - 70 + circle_y_offset), circle_size))
         pygame.draw.circle(screen, BLACK, (WIDTH//2, HEIGHT//2 - 70 + circle_y_offset), circle_size, 2)
+    
+    # パーティクルの描画
+    with profiler.section("particles"):
+        touched.extend(game.particles.draw(screen, alpha))
+    
+    # テキストを紙の上に描画（結果テキストは常に黒で表示して視認性を確保）
+    with profiler.section("text"):
+        text_y_offset = paper_y_offset  # 紙と同じオフセットを適用
+        for text, y in ((card.result_text, -30), (card.desc_text, 20), (card.points_text, 50)):
+            text.set_alpha(game.result_alpha)
+            touched.append(screen.blit(text, (WIDTH//2 - text.get_width()//2, HEIGHT//2 + y + text_y_offset)))
+    return touched
+
+# 描画（alpha: 前のステップから現在のステップまでの補間率）
+def render_frame(alpha=1.0):
+    # 和紙風の背景を描画（ダーティ矩形モードでは前フレームの描画範囲だけ）
+    # 静的レイヤーは場面が変わったときだけ作り直す
+    with profiler.section("background"):
+        layer = static_layers.get()
+        dirty.begin_frame(screen, layer.base)
+    
+    # 装飾的な背景要素を描画
+    with profiler.section("decorations"):
+        dirty.add(draw_decorative_elements(screen))
+    
+    # タイトル画面
+    if game.state == "title":
+        # 背景に和風の装飾を追加
+        with profiler.section("decorations"):
+            stride = quality.tier.decoration_stride
+            sizes = curves.title_dots.at(pygame.time.get_ticks())
+            for position, size in zip(TITLE_DOT_POSITIONS[::stride], sizes[::stride]):
+                sprite_batch.circle((((245, 240, 220), int(size)),), position)
+            dirty.add(sprite_batch.flush(screen))
         
-        desc_text = font_small.render(current_result["description"], True, BLACK)
-        desc_text.set_alpha(game.result_alpha)
+        # おみくじ箱を描画 - 右側に配置（タイトル画面用の豪華バージョン）
+        box_x = WIDTH - 350
+        box_y = HEIGHT//2 - 150
+        with profiler.section("box"):
+            dirty.add(draw_omikuji_box(box_x, box_y, 300, 250, shake=0, is_title=True))
         
-        # ポイント表示
-        points = current_result["points"]
-        points_text = font_medium.render(f"{points:+d} pt", True, 
-                                        (50, 180, 50) if points >= 0 else (180, 50, 50))
-        points_text.set_alpha(game.result_alpha)
+        # おみくじ箱から出る光の効果
+        with profiler.section("rays"):
+            start_x = box_x + 150
+            start_y = box_y + 100
+            
+            # グラデーションの光線（点の位置は表から引き、点の画像は光線の間で共通）
+            dots = [glow_atlas.dot(size, (255, 220, 100), dot_alpha)
+                    for size, dot_alpha in zip(RAY_DOT_SIZES.tolist(), RAY_DOT_ALPHAS.tolist())]
+            stride = quality.tier.ray_dot_stride
+            for ray in curves.rays.at(pygame.time.get_ticks()):
+                for (x, y), s in zip(ray[::stride], dots[::stride]):
+                    sprite_batch.add(s, (start_x + x, start_y + y))
+            ray_rects = sprite_batch.flush(screen)
+            if ray_rects:
+                dirty.add(ray_rects[0].unionall(ray_rects[1:]))
         
-        # 3連引きの合計ポイント計算
-        if game.current_triple_index == 2:  # 最後の結果の時だけ合計を計算
-            if game.total_points == 0:  # まだ計算していない場合
-                game.total_points = sum(result["points"] for result in game.triple_results)
+        # タイトルテキストをアニメーション（左側に配置、和風デザイン）
+        with profiler.section("text"):
+            title_y_offset = math.sin(pygame.time.get_ticks() * 0.002) * 8
+            
+            # タイトルテキスト（装飾枠は静的レイヤーに描いてある）
+            frame_rect = TITLE_FRAME_RECT
+            title_text = text_cache.render(assets.font_large, "おみくじゲーム", True, (120, 60, 30))
+            dirty.add(screen.blit(title_text, (frame_rect.centerx - title_text.get_width()//2, 
+                                              frame_rect.centery - title_text.get_height()//2 + title_y_offset)))
+            
+            # サブタイトル
+            dirty.add(layer.blit(screen, "subtitle"))
+        
+        # ボタン
+        with profiler.section("buttons"):
+            dirty.add(assets.draw_button.draw(screen))
+            dirty.add(assets.multi_button.draw(screen))
+            dirty.add(assets.stats_button.draw(screen))
+    
+    # おみくじを引いている途中
+    elif game.state == "drawing":
+        # おみくじ箱を描画（シェイク効果付き）
+        shake_amount = game.interpolate("shake_amount", alpha)
+        with profiler.section("box"):
+            dirty.add(draw_omikuji_box(WIDTH//2 - 150, HEIGHT//2 - 200, 300, 250, shake_amount, is_title=False))
+        
+        # 箱から出てきた紙と止まった紙の枚数
+        launched = papers_before(game.animation_timer, game.draw_count)
+        landed = papers_before(game.animation_timer - PAPER_FALL_STEPS, game.draw_count)
+        
+        # 複数引きの場合、進行状況を表示
+        if game.draw_count > 1:
+            dirty.add(draw_progress_text(screen, max(1, launched), game.draw_count))
+        
+        # パーティクルの描画
+        with profiler.section("particles"):
+            dirty.add(game.particles.draw(screen, alpha))
+        
+        # おみくじ紙が箱から出てくるアニメーション
+        # 止まった紙は同じ位置に重なるので一番上の1枚と、落ちている途中の紙だけを描く
+        with profiler.section("paper"):
+            paper_surface = get_paper_surface(300, 150)
+            render_time = game.animation_timer - 1 + alpha
+            for i in range(max(0, landed - 1), launched):
+                paper_y, paper_rotation, paper_scale = paper_pose(render_time - paper_launch(i))
+                
+                # 紙を回転・拡大縮小して描画
+                scaled_paper = transform_cache.rotozoom(paper_surface, paper_rotation, paper_scale)
+                paper_rect = scaled_paper.get_rect(center=(WIDTH//2, paper_y))
+                dirty.add(screen.blit(scaled_paper, paper_rect))
+        
+        with profiler.section("text"):
+            dirty.add(layer.blit(screen, "drawing_text"))
+            dirty.add(layer.blit(screen, "skip_text"))
+    
+    # 結果画面
+    elif game.state == "result":
+        # おみくじ箱を描画（静的レイヤーの画像）
+        with profiler.section("box"):
+            dirty.add(layer.blit(screen, "box"))
         
-        # 結果に応じたパーティクル効果
-        if game.animation_timer < 60 and game.animation_timer % 5 == 0:
-            for _ in range(3):
-                particle_x = WIDTH//2 + random.uniform(-150, 150)
-                particle_y = HEIGHT//2 + random.uniform(-50, 50)
-                game.particles.append(Particle(particle_x, particle_y, current_result["color"]))
+        dirty.add(draw_result_card(game.cards[0], alpha))
         
-        # パーティクルの更新と描画
-        for particle in game.particles[:]:
-            particle.update()
-            if particle.life <= 0:
-                game.particles.remove(particle)
-            else:
-                particle.draw(screen)
+        with profiler.section("buttons"):
+            dirty.add(assets.back_button.draw(screen))
+    
+    # 複数引きの結果画面
+    elif game.state == "multi_result":
+        # おみくじ箱を描画（上部に小さく、静的レイヤーの画像）
+        with profiler.section("box"):
+            dirty.add(layer.blit(screen, "box"))
         
-        # テキストを紙の上に描画
-        text_y_offset = paper_y_offset  # 紙と同じオフセットを適用
-        screen.blit(result_text, (WIDTH//2 - result_text.get_width()//2, HEIGHT//2 - 30 + text_y_offset))
-        screen.blit(desc_text, (WIDTH//2 - desc_text.get_width()//2, HEIGHT//2 + 20 + text_y_offset))
-        screen.blit(points_text, (WIDTH//2 - points_text.get_width()//2, HEIGHT//2 + 50 + text_y_offset))
-        
-        # 3連結果のインジケーター（中央上部に配置）- サイズを小さく調整
-        indicator_y = HEIGHT//2 + 80
-        for i in range(3):
-            circle_color = (200, 200, 200)
-            circle_size = 6  # 非選択時のサイズを小さく
-            if i == game.current_triple_index:
-                circle_color = current_result["color"]
-                circle_size = 8  # 選択時のサイズも小さく
-                # 選択中のインジケーターを脈動させる
-                circle_size += math.sin(pygame.time.get_ticks() * 0.01) * 1
-            pygame.draw.circle(screen, circle_color, (WIDTH//2 - 30 + i * 30, indicator_y), circle_size)
-            pygame.draw.circle(screen, BLACK, (WIDTH//2 - 30 + i * 30, indicator_y), circle_size, 1)
+        # 現在表示中の結果
+        current_card = game.cards[game.current_index]
+        dirty.add(draw_result_card(current_card, alpha))
+        
+        # 何枚目かのインジケーター（枚数が多いときは数字で表示）
+        indicator_y = INDICATOR_Y
+        if game.draw_count <= MAX_INDICATOR_DOTS:
+            # 選択されていない点は静的レイヤーの画像、選択中の点だけを脈動させて重ねる
+            dirty.add(layer.blit(screen, "indicator"))
+            circle_size = 8 + math.sin(pygame.time.get_ticks() * 0.01) * 1
+            circle_x = indicator_x(game.current_index, game.draw_count)
+            dirty.add(pygame.draw.circle(screen, current_card.color, (circle_x, indicator_y), circle_size))
+            pygame.draw.circle(screen, BLACK, (circle_x, indicator_y), circle_size, 1)
+        else:
+            page_text = text_cache.render(assets.font_small, f"{game.current_index + 1} / {game.draw_count}",
+                                          True, (100, 60, 20))
+            dirty.add(screen.blit(page_text, (WIDTH//2 - page_text.get_width()//2,
+                                              indicator_y - page_text.get_height()//2)))
         
         # 最後の結果の場合、合計ポイントを表示
-        if game.current_triple_index == 2:
-            total_text = font_medium.render(f"合計: {game.total_points:+d} pt", True, 
-                                          (50, 180, 50) if game.total_points >= 0 else (180, 50, 50))
+        if game.current_index == game.draw_count - 1:
+            total_text = text_cache.render(assets.font_medium, f"合計: {game.total_points:+d} pt", True, 
+                                                  (50, 180, 50) if game.total_points >= 0 else (180, 50, 50))
             total_text.set_alpha(game.result_alpha)
-            screen.blit(total_text, (WIDTH//2 - total_text.get_width()//2, indicator_y + 40))
-        
-        # ナビゲーションボタンを下部に配置（重ならないように）
-        button_y = HEIGHT - 80
-        
-        # 「タイトルに戻る」ボタンは中央下部に
-        back_button.rect.center = (WIDTH//2, button_y)
-        back_button.check_hover(mouse_pos)
-        back_button.draw(screen)
-        
-        # 「次へ」ボタンは右下に（最後の結果では表示しない）
-        if game.current_triple_index < 2:
-            next_button.rect.center = (WIDTH * 3//4, button_y)
-            next_button.check_hover(mouse_pos)
-            next_button.draw(screen)
+            dirty.add(screen.blit(total_text, (WIDTH//2 - total_text.get_width()//2, indicator_y + 25)))
             
-            if next_button.is_clicked(mouse_pos, mouse_click):
-                game.current_triple_index += 1
-                game.animation_timer = 0
-                game.result_alpha = 0
+            # 同じ枚数を引いてこの合計以上になる確率（運勢表から正確に計算した値）
+            odds_text = text_cache.render(assets.font_small, f"この合計以上になる確率 {game.total_odds:.1%}",
+                                          True, (100, 60, 20))
+            odds_text.set_alpha(game.result_alpha)
+            dirty.add(screen.blit(odds_text, (WIDTH//2 - odds_text.get_width()//2, indicator_y + 72)))
+        
+        # ナビゲーションボタン（「次へ」は最後、「前へ」は最初の結果では表示しない）
+        with profiler.section("buttons"):
+            dirty.add(assets.back_button.draw(screen))
+            if game.current_index < game.draw_count - 1:
+                dirty.add(assets.next_button.draw(screen))
+            if game.current_index > 0:
+                dirty.add(assets.prev_button.draw(screen))
+    
+    # 記録の画面（記録はこの画面にいる間は変わらないので、表は静的レイヤーの画像）
+    elif game.state == "stats":
+        with profiler.section("text"):
+            dirty.add(layer.blit(screen, "panel"))
         
-        if back_button.is_clicked(mouse_pos, mouse_click):
-            game.state = "title"
-            game.total_points = 0  # ポイントをリセット
+        with profiler.section("buttons"):
+            dirty.add(assets.back_button.draw(screen))
+    
+    # 計測結果の表示
+    if profiler.enabled:
+        with profiler.section("hud"):
+            dirty.add(profiler_hud.draw(screen))
+    
+    # 画面を更新（ダーティ矩形モードでは描画した範囲だけ転送）
+    with profiler.section("present"):
+        dirty.present()
+
+# 1フレーム分の処理（入力 → 固定ステップの更新 → 補間して描画）
+def run_frame(mouse_pos, mouse_click, frame_time=SIM_DT):
+    start = time.perf_counter()
+    with profiler.section("input"):
+        handle_input(mouse_pos, mouse_click)
+    with profiler.section("simulation"):
+        for _ in range(timestep.advance(frame_time)):
+            step_simulation()
+    render_frame(timestep.alpha)
+    quality.observe(time.perf_counter() - start)
+    sprite_batch.end_frame()
+    profiler.end_frame()
+
+# メインループ
+def main(argv=None):
+    global MULTI_DRAW_COUNT
+    parser = argparse.ArgumentParser(description="おみくじゲーム")
+    parser.add_argument("--startup-times", action="store_true",
+                        default=os.environ.get("OMIKUJI_STARTUP_TIMES") == "1",
+                        help="起動時間の内訳（ミリ秒）を表示する")
+    parser.add_argument("--fps", type=int, default=60,
+                        help="描画のフレームレート上限（0で上限なし）。アニメーションの速さは変わらない")
+    parser.add_argument("--multi", type=int, default=MULTI_DRAW_COUNT,
+                        help="複数引きの枚数（2以上）")
+    parser.add_argument("--quality", choices=["auto"] + [tier.name for tier in QUALITY_TIERS],
+                        default=os.environ.get("OMIKUJI_QUALITY", "auto"),
+                        help="画質（auto で処理時間に合わせて自動で切り替える）")
+    parser.add_argument("--scaled", action="store_true", default=window.scaled,
+                        help="ウィンドウの大きさに合わせてGPUで拡大表示する（pygame.SCALED）")
+    parser.add_argument("--fullscreen", action="store_true", default=window.fullscreen,
+                        help="全画面で拡大表示する")
+    parser.add_argument("--dirty-rects", action="store_true", default=dirty.enabled,
+                        help="前のフレームから描画した範囲だけを消して転送する（環境変数 OMIKUJI_DIRTY_RECTS=1 でも有効）")
+    parser.add_argument("--profile", action="store_true", default=profiler.enabled,
+                        help="区間ごとの処理時間を計測して表示する（F3キーで切り替え）")
+    parser.add_argument("--profile-csv", default=os.environ.get("OMIKUJI_PROFILE_CSV"),
+                        help="計測結果を書き出すCSVファイル（指定すると計測も有効になる）")
+    parser.add_argument("--idle-after", type=float, default=idle.idle_after,
+                        help="入力が無いと省電力モードにするまでの秒数（0で省電力モードにしない）")
+    parser.add_argument("--idle-fps", type=float, default=idle.idle_fps,
+                        help="省電力モードの描画回数/秒（0で入力が来るまで描画しない）")
+    parser.add_argument("--seed", type=seed_value, default=None, help="乱数のシード（省略時は毎回異なる）")
+    parser.add_argument("--record", help="シードとフレームごとの入力を記録するファイル"
+                                         "（omikuji_bench.py --replay で再生できる）")
+    parser.add_argument("--history", default=DEFAULT_HISTORY_PATH,
+                        help="抽選履歴を記録するファイル（環境変数 OMIKUJI_HISTORY でも指定できる）")
+    parser.add_argument("--no-history", action="store_true", help="抽選履歴をファイルに記録しない")
+    args = parser.parse_args(argv)
+    if args.multi < 2:
+        parser.error("--multi には2以上を指定してください")
+    if args.idle_after < 0 or args.idle_fps < 0:
+        parser.error("--idle-after と --idle-fps には0以上の値を指定してください")
+    MULTI_DRAW_COUNT = args.multi
+    idle.idle_after = args.idle_after
+    idle.idle_fps = args.idle_fps
+    window.scaled = args.scaled
+    window.fullscreen = args.fullscreen
+    dirty.set_enabled(args.dirty_rects)
+    quality.pin(None if args.quality == "auto" else args.quality)
+    if args.fps > 0:
+        quality.budget = 1.0 / args.fps
+    if args.profile_csv:
+        profiler.start_csv(args.profile_csv)
+    profiler.set_enabled(args.profile or bool(args.profile_csv))
+    if not args.no_history:
+        try:
+            with startup.phase("history"):
+                history.open(args.history)
+        except (OSError, ValueError) as e:
+            print(f"抽選履歴を開けませんでした（この起動中の分だけを集計します）: {e}")
+    
+    init()
+    
+    # 記録するときはシードを決めて保存する（再生するときに同じ乱数から始める）
+    seed = args.seed
+    if seed is None and args.record:
+        seed = random.SystemRandom().getrandbits(63)
+    if seed is not None:
+        seed_game(seed)
+    recorder = None
+    if args.record:
+        recorder = InputRecorder(args.record, MULTI_DRAW_COUNT, seed, time.time())
+    
+    clock = pygame.time.Clock()
+    clock.tick()
+    running = True
+    first_frame = True
+    frame_time = SIM_DT
+    
+    while running:
+        # しばらく入力が無ければ、次のフレームの時刻か入力が来るまで眠る
+        events = idle.wait() if idle.active() else pygame.event.get()
+        # マウスの位置はイベントを受け取った後で読む（眠っている間に動いた位置で判定する）
+        mouse_pos = pygame.mouse.get_pos()
+        mouse_click = False
+        for event in events:
+            if event.type in IdleMode.INPUT_EVENTS:
+                idle.wake()
+            if event.type == pygame.QUIT:
+                running = False
+            if event.type == pygame.MOUSEBUTTONDOWN:
+                if event.button == 1:  # 左クリック
+                    # 省電力モードを起こしたタップでも押した位置で判定する
+                    mouse_pos = event.pos
+                    mouse_click = True
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                profiler.toggle()
+            if event.type == pygame.WINDOWSIZECHANGED:
+                # ウィンドウの大きさが変わったら静的レイヤーと画面全体を描き直す
+                static_layers.invalidate()
+                dirty.invalidate()
+        
+        # このフレームの入力（フレーム時間・マウス・画質・状態）を記録する
+        if recorder is not None:
+            recorder.write(frame_time, mouse_pos, mouse_click, quality.level, GAME_STATES.index(game.state))
+        
+        if first_frame:
+            # 最初のフレームでフォントや背景が作られる
+            with startup.phase("first frame"):
+                run_frame(mouse_pos, mouse_click, frame_time)
+            if args.startup_times:
+                print(startup.report())
+            # 最初のフレームの処理時間は画質の判断に使わない
+            quality.reset()
+            first_frame = False
+        else:
+            # 前のフレームからの経過時間だけシミュレーションを進める
+            run_frame(mouse_pos, mouse_click, frame_time)
+        # 省電力モードでは event.wait で待ったので、ここでは経過時間を測るだけ
+        frame_time = clock.tick(0 if idle.sleeping else args.fps) / 1000
+        idle.sample()
     
-    pygame.display.flip()
-    clock.tick(60)
+    print(f"テキストキャッシュ: ヒット {text_cache.hits} / ミス {text_cache.misses}")
+    print(f"光のスプライト: 作成 {glow_atlas.created} / 再利用 {glow_atlas.hits}")
+    print(f"回転キャッシュ: ヒット {transform_cache.hits} / ミス {transform_cache.misses}")
+    print(f"静的レイヤー: 作成 {static_layers.builds} 回")
+    if sprite_batch.frames:
+        print(f"スプライトの一括転送: 平均 {sprite_batch.total_calls / sprite_batch.frames:.1f} 回/フレームで "
+              f"{sprite_batch.total_sprites / sprite_batch.frames:.1f} 個（円のスプライト: 作成 {circle_sprites.created}"
+              f" / 再利用 {circle_sprites.hits}）")
+    if quality.changes:
+        print(f"画質: {quality.tier.name}（切り替え {quality.changes} 回）")
+    if idle.report():
+        print(idle.report())
+    if profiler.recorded:
+        sections, frame_avg, frame_max = profiler.stats()
+        print(f"フレーム時間: 平均 {frame_avg:.2f} ms / 最大 {frame_max:.2f} ms")
+        for name, avg, worst in sections:
+            print(f"  {name}: 平均 {avg:.3f} ms / 最大 {worst:.3f} ms")
+    if recorder is not None:
+        recorder.close()
+        print(f"入力を記録しました: {args.record}（{recorder.frames} フレーム、シード {seed}）")
+    profiler.close()
+    history.close()
+    pygame.quit()
 
-pygame.quit()
-sys.exit()
+if __name__ == "__main__":
+    main()
+    sys.exit()
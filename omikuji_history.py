@@ -0,0 +1,319 @@
+"""
+おみくじの抽選履歴 (Omikuji Draw History)
+
+引いたおみくじを1枚ずつ追記専用のバイナリファイルに記録する。
+1件は16バイトの固定長（時刻・運勢の番号・モード・セッション）なので、
+読むときはファイルをメモリマップしてNumPyの配列としてそのまま扱える。
+
+運勢ごとの回数・合計ポイント・連続記録の集計は1件ごとにO(1)で更新する。
+集計結果は閉じるときにファイルの隣に保存し、次回はそれ以降に追記された分だけを読む。
+
+pygameに依存しないので、ゲーム以外からも読み書きできる。
+
+使い方:
+    python omikuji_history.py              # 標準の履歴ファイルの集計を表示する
+    python omikuji_history.py history.bin --rebuild --json
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+
+import numpy as np
+
+from omikuji_fortunes import fortune_table, load_table
+
+# 標準の履歴ファイル（環境変数 OMIKUJI_HISTORY で別のファイルを指定できる）
+DEFAULT_HISTORY_PATH = os.environ.get(
+    "OMIKUJI_HISTORY", os.path.join(os.path.expanduser("~"), ".local", "share", "omikuji", "history.bin"))
+
+MAGIC = b"OMKJHIST"
+FORMAT_VERSION = 1
+STATS_VERSION = 1
+STATS_SUFFIX = ".stats.npz"
+
+# ファイルの先頭（識別子・形式の版・1件の大きさ・作成時刻）
+HEADER_DTYPE = np.dtype([("magic", "S8"), ("version", "<u4"), ("record_size", "<u4"), ("created", "<f8")])
+# 1件の記録（time はUNIX時間の秒、mode は一緒に引いた枚数で 1 なら単発、session は起動ごとの番号）
+RECORD_DTYPE = np.dtype([("time", "<f8"), ("fortune", "<u2"), ("mode", "<u2"), ("session", "<u4")])
+
+MAX_MODE = np.iinfo(np.uint16).max
+
+# 集計（1件ごとにO(1)で更新する）
+class HistoryStats:
+    # 保存するときの整数の値の順番
+    SCALARS = ("draws", "total_points", "streak_fortune", "streak", "longest_fortune", "longest",
+               "session", "session_draws", "session_points")
+
+    def __init__(self, points):
+        self.points = [int(p) for p in points]  # 運勢の番号ごとのポイント
+        self.counts = [0] * len(self.points)
+        self.draws = 0
+        self.total_points = 0
+        self.streak_fortune = -1  # 最後に引いた運勢と、それが続いている回数
+        self.streak = 0
+        self.longest_fortune = -1  # 同じ運勢が続いた最長の記録（同じ長さなら先の記録）
+        self.longest = 0
+        self.session = 0  # 最後に記録したセッションと、そのセッションでの回数・ポイント
+        self.session_draws = 0
+        self.session_points = 0
+
+    def _grow(self, size):
+        if size > len(self.counts):
+            self.counts.extend([0] * (size - len(self.counts)))
+
+    # 1件を集計に加える
+    def add(self, fortune, session):
+        self._grow(fortune + 1)
+        # 運勢表より後ろの番号（運勢表を小さくした場合）はポイントなしとして数える
+        points = self.points[fortune] if fortune < len(self.points) else 0
+        self.counts[fortune] += 1
+        self.draws += 1
+        self.total_points += points
+
+        if fortune == self.streak_fortune:
+            self.streak += 1
+        else:
+            self.streak_fortune = fortune
+            self.streak = 1
+        if self.streak > self.longest:
+            self.longest_fortune = fortune
+            self.longest = self.streak
+
+        if session != self.session:
+            self.session = session
+            self.session_draws = 0
+            self.session_points = 0
+        self.session_draws += 1
+        self.session_points += points
+
+    # 記録の配列をまとめて集計に加える（1件ずつ add した結果と同じになる）
+    def add_records(self, records):
+        if len(records) == 0:
+            return
+        fortunes = records["fortune"].astype(np.int64)
+        sessions = records["session"]
+        size = max(len(self.counts), len(self.points), int(fortunes.max()) + 1)
+        self._grow(size)
+        counts = np.bincount(fortunes, minlength=size)
+        self.counts = [a + b for a, b in zip(self.counts, counts.tolist())]
+        points = np.zeros(size, dtype=np.int64)
+        points[:len(self.points)] = self.points
+        record_points = points[fortunes]
+        self.draws += len(fortunes)
+        self.total_points += int(record_points.sum())
+
+        # 同じ運勢が続く区間ごとの長さ（最初の区間は前回までの連続につながる）
+        starts = np.flatnonzero(fortunes[1:] != fortunes[:-1]) + 1
+        bounds = np.concatenate(([0], starts, [len(fortunes)]))
+        lengths = np.diff(bounds)
+        values = fortunes[bounds[:-1]]
+        if values[0] == self.streak_fortune:
+            lengths[0] += self.streak
+        longest = int(np.argmax(lengths))
+        if lengths[longest] > self.longest:
+            self.longest_fortune = int(values[longest])
+            self.longest = int(lengths[longest])
+        self.streak_fortune = int(values[-1])
+        self.streak = int(lengths[-1])
+
+        # セッションの番号は増えていくだけなので、最後のセッションの分は末尾にまとまっている
+        last = int(sessions[-1])
+        if last != self.session:
+            self.session = last
+            self.session_draws = 0
+            self.session_points = 0
+        in_session = sessions == last
+        self.session_draws += int(in_session.sum())
+        self.session_points += int(record_points[in_session].sum())
+
+    def to_dict(self, table=fortune_table):
+        def name(index):
+            return table[index]["result"] if 0 <= index < len(table) else None
+        return {
+            "draws": self.draws,
+            "total_points": self.total_points,
+            "mean_points": self.total_points / self.draws if self.draws else None,
+            "fortunes": [
+                {"result": entry["result"], "count": count,
+                 "ratio": count / self.draws if self.draws else None}
+                for entry, count in zip(table, self.counts)
+            ],
+            "streak": {"result": name(self.streak_fortune), "count": self.streak},
+            "longest_streak": {"result": name(self.longest_fortune), "count": self.longest},
+            "session": {"id": self.session, "draws": self.session_draws, "points": self.session_points},
+        }
+
+# 履歴ファイルの先頭を読んで確認する
+def read_header(file):
+    file.seek(0)
+    data = file.read(HEADER_DTYPE.itemsize)
+    if len(data) < HEADER_DTYPE.itemsize:
+        raise ValueError("履歴ファイルの先頭が壊れています")
+    header = np.frombuffer(data, dtype=HEADER_DTYPE)[0]
+    if header["magic"] != MAGIC:
+        raise ValueError("おみくじの履歴ファイルではありません")
+    if int(header["version"]) != FORMAT_VERSION or int(header["record_size"]) != RECORD_DTYPE.itemsize:
+        raise ValueError(f"履歴ファイルの形式が対応していません（版 {int(header['version'])}）")
+    return header
+
+# 保存した集計を読み込む（履歴ファイルや運勢表が変わっていたら None）
+# 集計は履歴から作り直せるキャッシュなので、電源断などで壊れていても読めなければ None にする
+def load_stats(stats_path, created, records, points):
+    try:
+        with np.load(stats_path, allow_pickle=False) as saved:
+            if (int(saved["version"]) != STATS_VERSION or float(saved["created"]) != created
+                    or saved["points"].tolist() != list(points)):
+                return None
+            counts = saved["counts"].tolist()
+            scalars = saved["scalars"].tolist()
+    except Exception:
+        return None
+    if len(scalars) != len(HistoryStats.SCALARS) or scalars[0] > records:
+        return None
+    stats = HistoryStats(points)
+    stats.counts = counts
+    for name, value in zip(HistoryStats.SCALARS, scalars):
+        setattr(stats, name, value)
+    return stats
+
+def save_stats(stats_path, created, stats):
+    try:
+        tmp_path = f"{stats_path}.{os.getpid()}.tmp.npz"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, version=STATS_VERSION, created=created,
+                     points=np.array(stats.points, dtype=np.int64),
+                     counts=np.array(stats.counts, dtype=np.int64),
+                     scalars=np.array([getattr(stats, name) for name in HistoryStats.SCALARS], dtype=np.int64))
+            # 置き換えた後に電源が切れても中身が空にならないように、ディスクに書き切ってから置き換える
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, stats_path)
+    except OSError as e:
+        print(f"履歴の集計を保存できませんでした: {e}")
+
+# 抽選履歴（open() するまではファイルに書かず、集計だけを行う）
+class DrawHistory:
+    def __init__(self, table=fortune_table):
+        self.table = table
+        self.path = None
+        self.file = None
+        self.created = 0.0
+        self.session = 1
+        self.stats = HistoryStats(table.points)
+
+    # 履歴ファイルを開き（無ければ作り）、集計を読み込む
+    def open(self, path=DEFAULT_HISTORY_PATH, rebuild=False):
+        self.close()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # 追記モードなので、書き込みは常にファイルの末尾に行われる
+        file = open(path, "a+b")
+        try:
+            size = file.seek(0, os.SEEK_END)
+            if size == 0:
+                header = np.array([(MAGIC, FORMAT_VERSION, RECORD_DTYPE.itemsize, time.time())], dtype=HEADER_DTYPE)[0]
+                file.write(header.tobytes())
+                file.flush()
+            else:
+                header = read_header(file)
+                # 書き込みの途中で終了して、最後の1件が途中までしか無ければ切り捨てる
+                partial = (size - HEADER_DTYPE.itemsize) % RECORD_DTYPE.itemsize
+                if partial:
+                    file.truncate(size - partial)
+        except (OSError, ValueError):
+            file.close()
+            raise
+
+        self.path = path
+        self.file = file
+        self.created = float(header["created"])
+
+        # 保存した集計があれば、その後に追記された分だけを読んで加える
+        records = self.records()
+        stats = None if rebuild else load_stats(self.stats_path, self.created, len(records), self.table.points)
+        if stats is None:
+            stats = HistoryStats(self.table.points)
+        stats.add_records(records[stats.draws:])
+        self.stats = stats
+        self.session = stats.session + 1
+        return stats
+
+    @property
+    def stats_path(self):
+        return self.path + STATS_SUFFIX
+
+    # 記録の件数（ファイルの大きさから計算する）
+    def __len__(self):
+        if self.path is None:
+            return 0
+        return max(0, os.path.getsize(self.path) - HEADER_DTYPE.itemsize) // RECORD_DTYPE.itemsize
+
+    # 全ての記録をメモリマップした配列で返す（読み取り専用）
+    def records(self):
+        count = len(self)
+        if count == 0:
+            return np.zeros(0, dtype=RECORD_DTYPE)
+        return np.memmap(self.path, dtype=RECORD_DTYPE, mode="r", offset=HEADER_DTYPE.itemsize, shape=(count,))
+
+    # 1回の抽選で引いた運勢の番号を記録する（mode は一緒に引いた枚数）
+    def record(self, indices, mode=1):
+        records = np.zeros(len(indices), dtype=RECORD_DTYPE)
+        records["time"] = time.time()
+        records["fortune"] = indices
+        records["mode"] = min(mode, MAX_MODE)
+        records["session"] = self.session
+        if self.file is not None:
+            # 1回の抽選の分をまとめて1回で書き込む
+            self.file.write(records.tobytes())
+            self.file.flush()
+        for index in indices:
+            self.stats.add(index, self.session)
+
+    # 集計を保存してファイルを閉じる
+    def close(self):
+        if self.file is None:
+            return
+        save_stats(self.stats_path, self.created, self.stats)
+        self.file.close()
+        self.file = None
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="おみくじの抽選履歴を集計する")
+    parser.add_argument("path", nargs="?", default=DEFAULT_HISTORY_PATH, help="履歴ファイル")
+    parser.add_argument("--fortunes", help="運勢表のJSONファイル（省略時は標準の運勢表）")
+    parser.add_argument("--rebuild", action="store_true", help="保存した集計を使わずに全件から集計し直す")
+    parser.add_argument("--json", action="store_true", help="結果をJSONで出力する")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.path):
+        sys.exit(f"履歴ファイルがありません: {args.path}")
+    table = load_table(args.fortunes) if args.fortunes else fortune_table
+    history = DrawHistory(table)
+    start = time.perf_counter()
+    try:
+        stats = history.open(args.path, rebuild=args.rebuild)
+    except ValueError as e:
+        sys.exit(str(e))
+    elapsed = time.perf_counter() - start
+    history.close()
+
+    report = stats.to_dict(table)
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        return
+
+    for fortune in report["fortunes"]:
+        ratio = fortune["ratio"] * 100 if fortune["ratio"] is not None else 0.0
+        print(f"{fortune['result']:<4} {fortune['count']:>12,} ({ratio:6.3f}%)")
+    if stats.draws:
+        print(f"合計ポイント: {report['total_points']:+,} (平均 {report['mean_points']:+.4f} pt)")
+        print(f"連続: {report['streak']['result']} {stats.streak} 回 / "
+              f"最長: {report['longest_streak']['result']} {stats.longest} 回")
+    print(f"{stats.draws:,} 件 / 読み込み {elapsed * 1000:.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+おみくじ抽選サーバー 負荷試験 (Omikuji Draw Service Load Test)
+
+ローカルの抽選サーバーに、keep-alive の接続を複数本張って続けてリクエストを送り、
+1秒あたりのリクエスト数とレイテンシの分布を表示する。
+
+使い方:
+    python omikuji_server.py --port 8080 &
+    python omikuji_loadtest.py --url "http://127.0.0.1:8080/draw?n=3" -c 50 -n 20000
+
+    # サーバーを子プロセスで起動してから試験する
+    python omikuji_loadtest.py --spawn -n 20000 --json
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+import subprocess
+from urllib.parse import urlsplit
+
+from omikuji_profiler import percentiles
+
+# 1本の接続でリクエストを送り続ける（latencies にナノ秒で記録する）
+async def worker(host, port, path, counter, latencies, errors):
+    reader, writer = await asyncio.open_connection(host, port)
+    request = f"GET {path} HTTP/1.1\r\nHost: {host}:{port}\r\n\r\n".encode("latin-1")
+    try:
+        while counter[0] > 0:
+            counter[0] -= 1
+            start = time.perf_counter_ns()
+            writer.write(request)
+            head = await reader.readuntil(b"\r\n\r\n")
+            length = 0
+            for line in head.split(b"\r\n")[1:]:
+                name, _, value = line.partition(b":")
+                if name.strip().lower() == b"content-length":
+                    length = int(value)
+            await reader.readexactly(length)
+            latencies.append(time.perf_counter_ns() - start)
+            if not head.startswith(b"HTTP/1.1 200"):
+                errors[0] += 1
+    finally:
+        writer.close()
+
+async def run_load(url, requests, concurrency):
+    parts = urlsplit(url)
+    host, port = parts.hostname, parts.port or 80
+    path = parts.path + (f"?{parts.query}" if parts.query else "")
+    counter = [requests]
+    latencies = []
+    errors = [0]
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(host, port, path, counter, latencies, errors)
+                           for _ in range(min(concurrency, requests))))
+    elapsed = time.perf_counter() - start
+
+    return {
+        "url": url,
+        "requests": len(latencies),
+        "errors": errors[0],
+        "concurrency": concurrency,
+        "seconds": round(elapsed, 3),
+        "requests_per_second": round(len(latencies) / elapsed, 1) if elapsed > 0 else None,
+        "latency_ms": percentiles(latencies, 1e6),
+    }
+
+# サーバーが接続を受け付けるようになるまで待つ
+def wait_for_port(host, port, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection((host, port), timeout=0.5):
+                return True
+        except OSError:
+            time.sleep(0.05)
+    return False
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="おみくじ抽選サーバーの負荷試験")
+    parser.add_argument("--url", default="http://127.0.0.1:8080/draw?n=3", help="リクエストを送るURL")
+    parser.add_argument("-n", "--requests", type=int, default=10000, help="送るリクエストの総数")
+    parser.add_argument("-c", "--concurrency", type=int, default=50, help="同時に張る接続の数")
+    parser.add_argument("--spawn", action="store_true", help="サーバーを子プロセスで起動してから試験する")
+    parser.add_argument("--json", action="store_true", help="結果をJSONで出力する")
+    args = parser.parse_args(argv)
+    if args.requests < 1 or args.concurrency < 1:
+        parser.error("--requests と --concurrency には1以上を指定してください")
+
+    server = None
+    if args.spawn:
+        parts = urlsplit(args.url)
+        server = subprocess.Popen(
+            [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "omikuji_server.py"),
+             "--host", parts.hostname, "--port", str(parts.port or 80)],
+            stdout=subprocess.DEVNULL)
+        if not wait_for_port(parts.hostname, parts.port or 80):
+            server.kill()
+            sys.exit("サーバーが起動しませんでした")
+
+    try:
+        report = asyncio.run(run_load(args.url, args.requests, args.concurrency))
+    except OSError as e:
+        sys.exit(f"サーバーに接続できませんでした: {e}")
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        return
+
+    latency = report["latency_ms"]
+    print(f"{report['requests']:,} 件 / {report['seconds']:.2f} 秒 "
+          f"({report['requests_per_second']:,} 件/秒, 同時接続 {report['concurrency']}, エラー {report['errors']})")
+    print(f"レイテンシ: p50 {latency['p50']:.2f} ms / p95 {latency['p95']:.2f} ms / "
+          f"p99 {latency['p99']:.2f} ms / 最大 {latency['max']:.2f} ms")
+
+if __name__ == "__main__":
+    main()
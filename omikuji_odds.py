@@ -0,0 +1,262 @@
+"""
+おみくじの合計ポイントの確率分布 (Omikuji Score Odds)
+
+運勢表からN枚引いたときの合計ポイントの分布を計算する。
+1枚の分布を畳み込んで求め、2のべき乗枚の分布をキャッシュして、N枚の分布は二進法で組み合わせて作る
+（100枚なら 64 + 32 + 4 枚の分布の畳み込み）。
+
+畳み込みは負の値の無い積の和なので、直接計算すれば各合計の確率は相対誤差 N×1e-16 程度まで正確で、
+起こりえない合計はちょうど0になる。裾の確率も引き算をせず、端から足し合わせて求める。
+分布が大きい（約1000枚を超える）ときだけFFTで畳み込むが、その場合は1e-16程度の絶対誤差が入り、
+それより小さい確率は信用できない（結果の exact が False になる）。
+
+「3枚で合計15pt以上になる確率」や「100枚引いたときの中央値」などにすぐ答えられる。
+モンテカルロ法の抽選結果と照らし合わせる確認（--check）も付いている。
+
+pygameに依存しない。
+
+使い方:
+    python omikuji_odds.py -n 3 --at-least 15
+    python omikuji_odds.py -n 100 --percentile 0.05 0.5 0.95 --check 1000000
+"""
+
+import sys
+import json
+import argparse
+from collections import OrderedDict
+
+import numpy as np
+
+from omikuji_fortunes import fortune_table, load_table
+
+# 長さの積がこれ以下ならそのまま畳み込む（1000枚の分布まで、数十ミリ秒以内）
+DIRECT_CONVOLVE_WORK = 1 << 26
+
+# FFTを使わずに畳み込むか
+def is_direct(a, b):
+    return len(a) * len(b) <= DIRECT_CONVOLVE_WORK
+
+# percentile で累積確率を比べるときの相対的な許容誤差
+PERCENTILE_TOLERANCE = 1e-12
+
+# 2つの確率分布の畳み込み
+def convolve(a, b):
+    if is_direct(a, b):
+        return np.convolve(a, b)
+    size = len(a) + len(b) - 1
+    fft_size = 1 << (size - 1).bit_length()
+    result = np.fft.irfft(np.fft.rfft(a, fft_size) * np.fft.rfft(b, fft_size), fft_size)[:size]
+    # FFTの丸め誤差で出る小さな負の値を0にして、合計を1に戻す
+    np.maximum(result, 0, out=result)
+    result /= result.sum()
+    return result
+
+# N枚の合計ポイントの分布（pmf[i] は合計が offset + i になる確率）
+# exact は全ての畳み込みを直接計算したか（False ならFFTの丸め誤差を含む）
+class ScoreDistribution:
+    def __init__(self, n, offset, pmf, exact=True):
+        # 出る確率が0の運勢（重み0）で広がった両端を除き、起こりうる最小と最大の合計を端にする
+        nonzero = np.flatnonzero(pmf)
+        first, last = int(nonzero[0]), int(nonzero[-1])
+        self.n = n
+        self.offset = offset + first
+        self.pmf = pmf[first:last + 1]
+        self.exact = exact
+        self.cdf = np.cumsum(self.pmf)
+        # sf[i] は合計が offset + i 以上になる確率（1から引くと小さな裾の確率が丸め誤差に埋もれる）
+        self.sf = np.cumsum(self.pmf[::-1])[::-1]
+
+    @property
+    def min_total(self):
+        return self.offset
+
+    @property
+    def max_total(self):
+        return self.offset + len(self.pmf) - 1
+
+    @property
+    def totals(self):
+        return np.arange(self.min_total, self.max_total + 1)
+
+    @property
+    def mean(self):
+        return float(self.totals @ self.pmf)
+
+    @property
+    def std(self):
+        return float(np.sqrt(((self.totals - self.mean) ** 2) @ self.pmf))
+
+    # 合計がちょうど total になる確率
+    def probability(self, total):
+        index = total - self.offset
+        return float(self.pmf[index]) if 0 <= index < len(self.pmf) else 0.0
+
+    # 合計が total 以下になる確率
+    def at_most(self, total):
+        index = total - self.offset
+        if index < 0:
+            return 0.0
+        return float(min(1.0, self.cdf[min(index, len(self.cdf) - 1)]))
+
+    # 合計が total 以上になる確率
+    def at_least(self, total):
+        index = total - self.offset
+        if index >= len(self.sf):
+            return 0.0
+        return float(min(1.0, self.sf[max(index, 0)]))
+
+    # 合計が total 以下になる確率が q 以上になる最小の合計（q = 0.5 なら中央値）
+    def percentile(self, q):
+        if not 0 <= q <= 1:
+            raise ValueError("q には0から1までの値を指定してください")
+        if q <= 0.5:
+            # 下側は累積確率が正確なので、丸め誤差の分だけ相対的にゆるめて探す
+            index = int(np.searchsorted(self.cdf, q * (1 - PERCENTILE_TOLERANCE)))
+        else:
+            # 上側は「合計が total より大きくなる確率が 1 - q 以下」として裾の確率で探す
+            # （累積確率は1の近くで丸め誤差に埋もれるので、q = 1 でも最大の合計が返るようにする）
+            above = np.append(self.sf[1:], 0.0)
+            index = int(np.searchsorted(-above, -(1 - q) * (1 + PERCENTILE_TOLERANCE)))
+        return self.offset + min(index, len(self.pmf) - 1)
+
+    def to_dict(self):
+        return {
+            "draws": self.n,
+            "min_total": self.min_total,
+            "max_total": self.max_total,
+            "mean": self.mean,
+            "std": self.std,
+            "exact": self.exact,
+        }
+
+# 運勢表からN枚引いたときの分布を計算する（2のべき乗枚の分布と、最近のN枚の分布をキャッシュする）
+class ScoreOdds:
+    def __init__(self, table=fortune_table, max_cached=64):
+        self.table = table
+        self.max_cached = max_cached
+        points = table.points
+        # 1枚の分布（ポイントの最小値からの位置ごとの確率）
+        single = np.zeros(int(points.max() - points.min()) + 1, dtype=np.float64)
+        np.add.at(single, points - points.min(), table.probabilities)
+        self.min_points = int(points.min())
+        self.powers = [single]  # powers[k] は 2**k 枚の分布
+        self.exact_powers = [True]  # powers[k] をFFTを使わずに求めたか
+        self.cache = OrderedDict()
+        self.convolutions = 0
+
+    def power(self, k):
+        while len(self.powers) <= k:
+            last = self.powers[-1]
+            self.exact_powers.append(self.exact_powers[-1] and is_direct(last, last))
+            self.powers.append(convolve(last, last))
+            self.convolutions += 1
+        return self.powers[k]
+
+    def distribution(self, n):
+        if n < 1:
+            raise ValueError("枚数には1以上を指定してください")
+        result = self.cache.get(n)
+        if result is not None:
+            self.cache.move_to_end(n)
+            return result
+
+        pmf = None
+        exact = True
+        for k in range(n.bit_length()):
+            if n >> k & 1:
+                power = self.power(k)
+                exact = exact and self.exact_powers[k]
+                if pmf is None:
+                    pmf = power
+                else:
+                    exact = exact and is_direct(pmf, power)
+                    pmf = convolve(pmf, power)
+                    self.convolutions += 1
+        result = ScoreDistribution(n, n * self.min_points, pmf, exact)
+
+        self.cache[n] = result
+        while len(self.cache) > self.max_cached:
+            self.cache.popitem(last=False)
+        return result
+
+# ゲームと同じ運勢表の分布
+score_odds = ScoreOdds()
+
+# モンテカルロ法で実際に抽選した合計ポイントの分布と、計算した分布を比べる
+# 返り値: 各合計の確率の差の最大値と、その許容値（標準誤差の5倍、これ以下なら一致とみなす）
+def monte_carlo_check(odds, n, trials=1_000_000, seed=None, batch_size=1 << 20):
+    rng = np.random.default_rng(seed)
+    distribution = odds.distribution(n)
+    counts = np.zeros(len(distribution.pmf), dtype=np.int64)
+    points = odds.table.points
+    remaining = trials
+    while remaining > 0:
+        rows = min(remaining, max(1, batch_size // n))
+        totals = points[odds.table.sample_indices(rng, rows * n)].reshape(rows, n).sum(axis=1)
+        counts += np.bincount(totals - distribution.offset, minlength=len(counts))
+        remaining -= rows
+    empirical = counts / trials
+    error = float(np.abs(empirical - distribution.pmf).max())
+    tolerance = 5 * float(np.sqrt(distribution.pmf.max() * (1 - distribution.pmf.max()) / trials))
+    return error, tolerance
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="おみくじをN枚引いたときの合計ポイントの確率")
+    parser.add_argument("-n", "--draws", type=int, default=3, help="引く枚数")
+    parser.add_argument("--at-least", type=int, action="append", default=[],
+                        help="合計がこの値以上になる確率を表示する（複数指定可）")
+    parser.add_argument("--at-most", type=int, action="append", default=[],
+                        help="合計がこの値以下になる確率を表示する（複数指定可）")
+    parser.add_argument("--percentile", type=float, nargs="+", default=[],
+                        help="累積確率がこの値になる合計を表示する（例: 0.05 0.5 0.95）")
+    parser.add_argument("--table", action="store_true", help="合計ごとの確率を全て表示する")
+    parser.add_argument("--check", type=int, metavar="TRIALS",
+                        help="モンテカルロ法で TRIALS 回抽選して計算結果と照らし合わせる")
+    parser.add_argument("--seed", type=int, default=None, help="--check の乱数のシード")
+    parser.add_argument("--fortunes", help="運勢表のJSONファイル（省略時は標準の運勢表）")
+    parser.add_argument("--json", action="store_true", help="結果をJSONで出力する")
+    args = parser.parse_args(argv)
+    if args.draws < 1:
+        parser.error("--draws には1以上を指定してください")
+
+    odds = ScoreOdds(load_table(args.fortunes)) if args.fortunes else score_odds
+    try:
+        distribution = odds.distribution(args.draws)
+        report = distribution.to_dict()
+        report["at_least"] = {str(x): distribution.at_least(x) for x in args.at_least}
+        report["at_most"] = {str(x): distribution.at_most(x) for x in args.at_most}
+        report["percentiles"] = {str(q): distribution.percentile(q) for q in args.percentile}
+    except ValueError as e:
+        sys.exit(str(e))
+    if args.table:
+        report["table"] = {str(total): float(p) for total, p in zip(distribution.totals.tolist(), distribution.pmf)
+                           if p > 0}
+    if args.check:
+        error, tolerance = monte_carlo_check(odds, args.draws, args.check, args.seed)
+        report["check"] = {"trials": args.check, "max_error": error, "tolerance": tolerance,
+                           "ok": error <= tolerance}
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        print(f"{args.draws} 枚の合計: {distribution.min_total:+d} 〜 {distribution.max_total:+d} pt"
+              f"（平均 {distribution.mean:+.3f}、標準偏差 {distribution.std:.3f}）")
+        if not distribution.exact:
+            print("  ※ FFTで畳み込んだので、1e-16 程度より小さい確率は正確ではありません")
+        for x, p in report["at_least"].items():
+            print(f"  {int(x):+d} pt 以上: {p:.6%}")
+        for x, p in report["at_most"].items():
+            print(f"  {int(x):+d} pt 以下: {p:.6%}")
+        for q, total in report["percentiles"].items():
+            print(f"  {float(q):.0%} 点: {total:+d} pt")
+        for total, p in report.get("table", {}).items():
+            print(f"  {int(total):+5d} pt: {p:.6%}")
+        if args.check:
+            check = report["check"]
+            print(f"モンテカルロ法 {args.check:,} 回: 最大の差 {check['max_error']:.2e}"
+                  f"（許容 {check['tolerance']:.2e}）→ {'一致' if check['ok'] else '不一致'}")
+    if args.check and not report["check"]["ok"]:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""
+おみくじゲーム フレームプロファイラ (Omikuji Frame Profiler)
+
+メインループの名前付きの区間を perf_counter_ns で計測して、
+直近のフレームをリングバッファに保持する（平均と最悪値はゲームのHUDに表示する）。
+CSVへの書き出しはバックグラウンドのスレッドで行い、ゲームループを止めない。
+
+pygameに依存しないので、ゲーム以外の計測にも使える。
+"""
+
+import csv
+import time
+import queue
+import threading
+import contextlib
+
+import numpy as np
+
+# 計測しないときに返す何もしない区間
+NULL_SECTION = contextlib.nullcontext()
+
+# 計測区間（同じ名前の区間が1フレームに何回あっても合計する）
+class ProfileSection:
+    __slots__ = ("times", "index", "start")
+
+    def __init__(self, times, index):
+        self.times = times
+        self.index = index
+        self.start = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.times[self.index] += time.perf_counter_ns() - self.start
+        return False
+
+# 計測結果をCSVに書き出すスレッド（1行 = 1フレームの1区間）
+class CsvWriter:
+    def __init__(self, path, flush_interval=1.0):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.queue = queue.SimpleQueue()
+        self.file = open(path, "w", newline="", encoding="utf-8")
+        self.thread = threading.Thread(target=self.run, name="profiler-csv", daemon=True)
+        self.thread.start()
+
+    def write(self, frame, frame_ns, sections):
+        # ゲームループ側はキューに入れるだけ
+        self.queue.put((frame, frame_ns, sections))
+
+    def run(self):
+        writer = csv.writer(self.file)
+        writer.writerow(["frame", "section", "ms"])
+        last_flush = time.monotonic()
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            frame, frame_ns, sections = item
+            writer.writerow([frame, "frame", f"{frame_ns / 1e6:.4f}"])
+            writer.writerows([frame, name, f"{ns / 1e6:.4f}"] for name, ns in sections)
+            if time.monotonic() - last_flush >= self.flush_interval:
+                self.file.flush()
+                last_flush = time.monotonic()
+        self.file.close()
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+
+# 計測値の分布の要約（values を scale で割った単位で、ベンチマークや負荷試験の結果に使う）
+def percentiles(values, scale):
+    values = np.asarray(values, dtype=np.float64) / scale
+    if len(values) == 0:
+        return {"p50": None, "p95": None, "p99": None, "mean": None, "max": None}
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        "p50": round(float(p50), 4),
+        "p95": round(float(p95), 4),
+        "p99": round(float(p99), 4),
+        "mean": round(float(values.mean()), 4),
+        "max": round(float(values.max()), 4),
+    }
+
+# フレームごとの区間の計測
+class FrameProfiler:
+    def __init__(self, history=300, max_sections=32, enabled=False):
+        self.history = history  # リングバッファに保持するフレーム数
+        self.names = []
+        self.sections = {}
+        self.times = [0] * max_sections  # 計測中のフレームの区間ごとの時間（ns）
+        self.samples = np.zeros((history, max_sections), dtype=np.int64)
+        self.frame_ns = np.zeros(history, dtype=np.int64)
+        self.frame = 0  # 計測したフレームの通し番号（CSV用）
+        self.recorded = 0  # リングバッファに入っているフレーム数
+        self.last_frame = None
+        self.writer = None
+        self.enabled = False
+        self.set_enabled(enabled)
+
+    def set_enabled(self, enabled):
+        # 計測を始めるときはリングバッファを空にする（止めていた間の時間を含めない）
+        if enabled and not self.enabled:
+            self.recorded = 0
+            self.last_frame = None
+            self.times[:] = [0] * len(self.times)
+        self.enabled = enabled
+
+    def toggle(self):
+        self.set_enabled(not self.enabled)
+        return self.enabled
+
+    # with profiler.section("名前"): で区間を計測する
+    def section(self, name):
+        if not self.enabled:
+            return NULL_SECTION
+        section = self.sections.get(name)
+        if section is None:
+            if len(self.names) >= len(self.times):
+                raise ValueError(f"計測区間が多すぎます: {name}")
+            section = ProfileSection(self.times, len(self.names))
+            self.sections[name] = section
+            self.names.append(name)
+        return section
+
+    # 1フレームの終わりに呼ぶ（フレーム時間は前回の呼び出しからの経過時間）
+    def end_frame(self):
+        if not self.enabled:
+            return
+        now = time.perf_counter_ns()
+        row = self.recorded % self.history
+        n = len(self.names)
+        self.samples[row, :n] = self.times[:n]
+        self.samples[row, n:] = 0
+        self.frame_ns[row] = now - self.last_frame if self.last_frame is not None else 0
+        if self.writer is not None:
+            self.writer.write(self.frame, int(self.frame_ns[row]), list(zip(self.names, self.times[:n])))
+        self.times[:n] = [0] * n
+        self.last_frame = now
+        self.frame += 1
+        self.recorded += 1
+
+    # リングバッファ内のフレームの区間ごとの平均と最大（ミリ秒）
+    # 返り値: ([(名前, 平均, 最大), ...], フレーム時間の平均, フレーム時間の最大)
+    def stats(self):
+        count = min(self.recorded, self.history)
+        if count == 0:
+            return [], 0.0, 0.0
+        samples = self.samples[:count, :len(self.names)] / 1e6
+        sections = list(zip(self.names, samples.mean(axis=0).tolist(), samples.max(axis=0).tolist()))
+        # 最初のフレームは前のフレームが無いので除く
+        frames = self.frame_ns[:count][self.frame_ns[:count] > 0] / 1e6
+        if len(frames) == 0:
+            return sections, 0.0, 0.0
+        return sections, float(frames.mean()), float(frames.max())
+
+    # 計測結果のCSVへの書き出しを始める
+    def start_csv(self, path):
+        self.close()
+        self.writer = CsvWriter(path)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
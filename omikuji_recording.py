@@ -0,0 +1,86 @@
+"""
+おみくじゲーム 入力の記録 (Omikuji Input Recording)
+
+ゲームを再現できるように、乱数のシードとフレームごとの入力を小さなバイナリファイルに記録する。
+1フレームは15バイト（フレーム時間・マウスの位置・クリック・画質・状態）で、
+ベンチマーク（omikuji_bench.py --replay）で待ち時間なしに再生して処理時間を計測できる。
+
+シミュレーションは記録したフレーム時間で進め、乱数は記録したシードから始めるので、
+同じ入力なら同じ結果になる（状態を記録してあるので、再生がずれたら検出できる）。
+
+pygameに依存しない。
+"""
+
+import argparse
+
+import numpy as np
+
+MAGIC = b"OMKJREC1"
+FORMAT_VERSION = 1
+
+# ファイルの先頭（識別子・形式の版・複数引きの枚数・乱数のシード・記録した時刻）
+HEADER_DTYPE = np.dtype([("magic", "S8"), ("version", "<u4"), ("multi", "<u4"), ("seed", "<u8"),
+                         ("created", "<f8")])
+# 1フレームの記録（フレーム時間は秒、quality は画質の段階、state はフレームの開始時の状態の番号）
+FRAME_DTYPE = np.dtype([("frame_time", "<f8"), ("x", "<i2"), ("y", "<i2"), ("click", "u1"),
+                        ("quality", "u1"), ("state", "u1")])
+
+# 乱数のシードに使える値（NumPyの乱数は負のシードを受け付けず、記録には符号なし64ビットで書く）
+MAX_SEED = 2**64 - 1
+
+# argparse の type に使う、シードの値の確認
+def seed_value(text):
+    try:
+        seed = int(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"整数を指定してください: {text}")
+    if not 0 <= seed <= MAX_SEED:
+        raise argparse.ArgumentTypeError(f"0から{MAX_SEED}までの整数を指定してください: {text}")
+    return seed
+
+# 記録したゲームの情報
+class RecordingHeader:
+    def __init__(self, multi, seed, created):
+        self.multi = multi
+        self.seed = seed
+        self.created = created
+
+# フレームごとの入力をファイルに書く（書き込みはバッファして、close() で書き切る）
+class InputRecorder:
+    def __init__(self, path, multi, seed, created):
+        self.path = path
+        self.frames = 0
+        self.file = open(path, "wb")
+        header = np.array([(MAGIC, FORMAT_VERSION, multi, seed, created)], dtype=HEADER_DTYPE)
+        self.file.write(header.tobytes())
+        self.record = np.zeros(1, dtype=FRAME_DTYPE)
+
+    def write(self, frame_time, mouse_pos, mouse_click, quality, state):
+        record = self.record
+        record["frame_time"] = frame_time
+        record["x"], record["y"] = mouse_pos
+        record["click"] = mouse_click
+        record["quality"] = quality
+        record["state"] = state
+        self.file.write(record.tobytes())
+        self.frames += 1
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+# 記録を読み込んで (RecordingHeader, フレームの配列) を返す
+def load_recording(path):
+    with open(path, "rb") as f:
+        header = np.frombuffer(f.read(HEADER_DTYPE.itemsize), dtype=HEADER_DTYPE)
+        if len(header) == 0 or header[0]["magic"] != MAGIC:
+            raise ValueError(f"入力の記録ファイルではありません: {path}")
+        if int(header[0]["version"]) != FORMAT_VERSION:
+            raise ValueError(f"入力の記録ファイルの形式が対応していません（版 {int(header[0]['version'])}）")
+        data = f.read()
+    # 書き込みの途中で終了して、最後のフレームが途中までしか無ければ捨てる
+    count = len(data) // FRAME_DTYPE.itemsize
+    frames = np.frombuffer(data[:count * FRAME_DTYPE.itemsize], dtype=FRAME_DTYPE)
+    header = header[0]
+    return RecordingHeader(int(header["multi"]), int(header["seed"]), float(header["created"])), frames
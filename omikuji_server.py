@@ -0,0 +1,237 @@
+"""
+おみくじ抽選サーバー (Omikuji Draw Service)
+
+Webやスマートフォンのフロントエンド向けに、ゲームと同じ運勢表と抽選・得点のルールで
+おみくじを引くHTTPサービス。pygameは使わず、標準ライブラリの asyncio だけで動く。
+
+同時に届いたリクエストの抽選はまとめて行う（多いときはNumPyで1回に引く）。
+運勢ごとのJSONは最初に作っておき、レスポンスはそれをつなげるだけで作る。
+
+エンドポイント:
+    GET /draw?n=3   n枚引いて結果と合計ポイントを返す（省略時は1枚）
+    GET /fortunes   運勢表と出る確率
+    GET /health     動作確認
+
+使い方:
+    python omikuji_server.py --port 8080 --seed 1
+"""
+
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+from urllib.parse import urlsplit, parse_qs
+
+import numpy as np
+
+from omikuji_fortunes import load_table, fortune_table, total_points
+
+# 1回のリクエストで引ける最大の枚数
+MAX_DRAWS = 100
+# まとめて引く枚数がこれ以上ならNumPyで引く（少ないときは1回ずつ引く方が速い）
+VECTOR_THRESHOLD = 64
+# リクエストのヘッダーの最大の大きさ
+MAX_HEADER_SIZE = 8192
+
+STATUS_TEXT = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+               431: "Request Header Fields Too Large", 500: "Internal Server Error"}
+
+# 運勢ごとのレスポンス用のJSON（ゲームに表示するのと同じ項目）
+def encode_results(results):
+    return [json.dumps({"result": r["result"], "color": list(r["color"]), "description": r["description"],
+                        "points": r["points"]}, ensure_ascii=False).encode("utf-8")
+            for r in results]
+
+# 同じ時に届いた抽選をまとめて行う
+class DrawBatcher:
+    def __init__(self, table=fortune_table, seed=None):
+        self.table = table
+        self.rng = random.Random(seed)
+        self.np_rng = np.random.default_rng(seed)
+        self.pending = []  # (枚数, 結果を受け取る Future)
+        self.wakeup = asyncio.Event()
+        self.batches = 0
+        self.draws = 0
+
+    # n枚引いて運勢の番号のリストを返す
+    async def draw(self, n):
+        future = asyncio.get_running_loop().create_future()
+        self.pending.append((n, future))
+        self.wakeup.set()
+        return await future
+
+    def sample(self, count):
+        if count >= VECTOR_THRESHOLD:
+            return self.table.sample_indices(self.np_rng, count).tolist()
+        return [self.table.draw_index(self.rng) for _ in range(count)]
+
+    # 待っている抽選を、前回から溜まった分ずつまとめて引く
+    async def run(self):
+        while True:
+            await self.wakeup.wait()
+            self.wakeup.clear()
+            pending, self.pending = self.pending, []
+            count = sum(n for n, _ in pending)
+            try:
+                indices = self.sample(count)
+            except Exception as e:
+                # 抽選に失敗したら、待っているリクエストにエラーを返す（返さないと応答しないままになる）
+                for _, future in pending:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            offset = 0
+            for n, future in pending:
+                if not future.done():
+                    future.set_result(indices[offset:offset + n])
+                offset += n
+            self.batches += 1
+            self.draws += count
+
+class DrawService:
+    def __init__(self, table=fortune_table, seed=None, max_draws=MAX_DRAWS):
+        self.table = table
+        self.results = table.entries
+        self.max_draws = max_draws
+        self.batcher = DrawBatcher(table, seed)
+        self.encoded = encode_results(self.results)
+        self.fortunes_body = json.dumps({
+            "fortunes": [dict(json.loads(encoded), probability=float(p))
+                         for encoded, p in zip(self.encoded, table.probabilities)],
+            "max_draws": max_draws,
+        }, ensure_ascii=False).encode("utf-8")
+        self.requests = 0
+        self.started = time.monotonic()
+
+    async def draw_body(self, n):
+        indices = await self.batcher.draw(n)
+        points = total_points(self.results[i] for i in indices)
+        return b"".join((b'{"count":', str(n).encode(), b',"results":[',
+                         b",".join(self.encoded[i] for i in indices),
+                         b'],"total_points":', str(points).encode(), b"}"))
+
+    # 1件のリクエストを処理して (ステータス, 本文) を返す
+    async def handle(self, method, target):
+        url = urlsplit(target)
+        if url.path not in ("/draw", "/fortunes", "/health"):
+            return 404, error_body("見つかりません")
+        if method != "GET":
+            return 405, error_body("GETで呼び出してください")
+        if url.path == "/fortunes":
+            return 200, self.fortunes_body
+        if url.path == "/health":
+            return 200, json.dumps({"status": "ok", "requests": self.requests, "draws": self.batcher.draws,
+                                    "uptime": round(time.monotonic() - self.started, 1)}).encode()
+
+        query = parse_qs(url.query)
+        try:
+            n = int(query.get("n", ["1"])[0])
+        except ValueError:
+            return 400, error_body("n には整数を指定してください")
+        if not 1 <= n <= self.max_draws:
+            return 400, error_body(f"n には1から{self.max_draws}までを指定してください")
+        return 200, await self.draw_body(n)
+
+    # 1本の接続を処理する（keep-alive なら続けて次のリクエストを読む）
+    async def serve_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except asyncio.LimitOverrunError:
+                    writer.write(response(431, error_body("ヘッダーが大きすぎます"), False))
+                    break
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                keep_alive, method, target, length = parse_request(head)
+                if method is None:
+                    writer.write(response(400, error_body("リクエストが正しくありません"), False))
+                    break
+                if length:
+                    await reader.readexactly(length)
+                self.requests += 1
+                try:
+                    status, body = await self.handle(method, target)
+                except Exception as e:
+                    print(f"リクエストの処理に失敗しました: {method} {target}: {e!r}", file=sys.stderr)
+                    status, body = 500, error_body("サーバーでエラーが発生しました")
+                writer.write(response(status, body, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host, port):
+        batcher = asyncio.create_task(self.batcher.run())
+        server = await asyncio.start_server(self.serve_connection, host, port, limit=MAX_HEADER_SIZE)
+        addresses = ", ".join(f"http://{s.getsockname()[0]}:{s.getsockname()[1]}" for s in server.sockets)
+        print(f"おみくじサーバーを開始しました: {addresses}", flush=True)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batcher.cancel()
+
+    def report(self):
+        batches = self.batcher.batches
+        mean = self.batcher.draws / batches if batches else 0
+        return (f"リクエスト {self.requests:,} 件 / 抽選 {self.batcher.draws:,} 枚 "
+                f"/ まとめて引いた回数 {batches:,} 回（平均 {mean:.1f} 枚）")
+
+def error_body(message):
+    return json.dumps({"error": message}, ensure_ascii=False).encode("utf-8")
+
+# リクエストの先頭行とヘッダーから (keep-alive, メソッド, パス, 本文の長さ) を取り出す
+def parse_request(head):
+    lines = head.decode("latin-1").split("\r\n")
+    parts = lines[0].split(" ")
+    if len(parts) != 3 or not parts[2].startswith("HTTP/"):
+        return False, None, None, 0
+    method, target, version = parts
+    headers = {}
+    for line in lines[1:]:
+        name, sep, value = line.partition(":")
+        if sep:
+            headers[name.strip().lower()] = value.strip().lower()
+    connection = headers.get("connection", "")
+    keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+    try:
+        length = int(headers.get("content-length", "0"))
+    except ValueError:
+        return False, None, None, 0
+    return keep_alive, method, target, max(0, length)
+
+def response(status, body, keep_alive):
+    head = (f"HTTP/1.1 {status} {STATUS_TEXT[status]}\r\n"
+            "Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            "Access-Control-Allow-Origin: *\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    return head.encode("latin-1") + body
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="おみくじを引くHTTPサービス")
+    parser.add_argument("--host", default="127.0.0.1", help="待ち受けるアドレス")
+    parser.add_argument("--port", type=int, default=8080, help="待ち受けるポート")
+    parser.add_argument("--seed", type=int, default=None, help="乱数のシード（省略時は毎回異なる）")
+    parser.add_argument("--fortunes", help="運勢表のJSONファイル（省略時は標準の運勢表）")
+    parser.add_argument("--max-draws", type=int, default=MAX_DRAWS, help="1回のリクエストで引ける最大の枚数")
+    args = parser.parse_args(argv)
+
+    table = load_table(args.fortunes) if args.fortunes else fortune_table
+    service = DrawService(table, args.seed, args.max_draws)
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    except OSError as e:
+        sys.exit(f"サーバーを開始できませんでした: {e}")
+    print(service.report())
+
+if __name__ == "__main__":
+    main()